@@ -9,3 +9,6 @@
 
 class ChecksNotRunException(Exception):
     pass
+
+class CircuitOpenException(Exception):
+    pass
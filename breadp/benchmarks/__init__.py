@@ -7,8 +7,10 @@
 #
 ################################################################################
 
+from contextlib import contextmanager
 from datetime import datetime
 import inspect
+import time
 
 class Benchmark(object):
     """ Base class and interface to benchmark RDPs
@@ -23,11 +25,18 @@ class Benchmark(object):
         A short text describing the benchmark (in English)
     evaluations:
         A list of evaluations
+    checks_run: int
+        Number of check executions by check_all, acheck_all and check_batch
+    checks_saved: int
+        Number of check executions saved by planning (see plan) or lazy
+        scoring (see score)
 
     Methods
     -------
     run(self, rdp) -> None
         Runs the benchmark
+    plan(self, rdp) -> list
+        Returns the checks needed to score an RDP
     """
     def __init__(self, name=None):
         def skip_function(evaluation, rdp):
@@ -38,6 +47,8 @@ class Benchmark(object):
         self.version = "Blank benchmarks have no version"
         self.id = "Blank benchmarks have no id"
         self.rounded = 10
+        self.checks_run = 0
+        self.checks_saved = 0
         self.name = name
         if self.name is None:
             self.name = type(self).__name__
@@ -74,19 +85,228 @@ class Benchmark(object):
                 return
         self.checks.append(add_check)
 
-    def check_all(self, rdp):
+    def set_logs(self, factory):
+        """ Replaces the logs of all checks
+
+        Arguments
+        ---------
+        factory: callable
+            Called with each check, returns the new (empty) log of the check
+        """
+        for c in self.checks:
+            c.log = factory(c)
+
+    def set_retention(self, retention):
+        """ Sets the retention policies of the logs of all checks
+
+        Arguments
+        ---------
+        retention: RetentionPolicy or list
+            Retention policy (or list of policies), None keeps all entries
+        """
+        for c in self.checks:
+            c.log.retention = retention
+
+    def set_result_cache(self, cache):
+        """ Sets the cache of results of all checks (see Check.results)
+
+        Arguments
+        ---------
+        cache: Cache
+            Cache shared by all checks, None does not cache results
+        """
+        for c in self.checks:
+            c.results = cache
+
+    @contextmanager
+    def hold(self, pid):
+        """ Context manager protecting the last results for the given pid
+            from eviction by retention policies while it is evaluated
+        """
+        for c in self.checks:
+            c.log.pin(pid)
+        try:
+            yield self
+        finally:
+            for c in self.checks:
+                c.log.unpin(pid)
+
+    def plan(self, rdp):
+        """ Returns the checks needed to score an RDP: the checks of all
+            evaluations which are not skipped for it (in the order of
+            self.checks, a check shared by several evaluations is needed if
+            any of them is not skipped)
+        """
+        needed = set()
+        for e in self.evaluations:
+            if not self.skip(e, rdp):
+                needed.update(c.id for c in e.checks)
+        return [c for c in self.checks if c.id in needed]
+
+    def _planned(self, rdp, plan, checks=None):
+        if checks is None:
+            checks = self.plan(rdp) if plan else self.checks
+        elif plan:
+            needed = self.plan(rdp)
+            checks = [c for c in needed if c in checks]
+        self.checks_run += len(checks)
+        self.checks_saved += len(self.checks) - len(checks)
+        return checks
+
+    def check_all(self, rdp, executor=None, max_workers=None, deadline=None,
+                  plan=False, checks=None):
+        """ Runs all checks for an RDP
+
+        Arguments
+        ---------
+        rdp: Rdp
+            Research Data Product to be checked
+        executor: concurrent.futures.Executor
+            If given, the checks are submitted to the executor and run
+            concurrently (e.g. a ThreadPoolExecutor for I/O-bound checks)
+        max_workers: int
+            If given (and executor is not), the checks run concurrently in a
+            thread pool with max_workers threads
+        deadline: float
+            Time budget of all checks in seconds, checks get the remaining
+            budget (or their own timeout if it is smaller) as time budget
+        plan: bool
+            Whether only the checks needed to score the RDP run (see plan)
+        checks: list
+            Checks of the benchmark to run (defaults to all checks)
+        """
+        if executor is None and max_workers is not None:
+            from concurrent.futures import ThreadPoolExecutor
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                self.check_all(rdp, executor, deadline=deadline, plan=plan,
+                               checks=checks)
+            return
+        budget = self._budgeted(deadline)
+        checks = self._planned(rdp, plan, checks)
+        if executor is None:
+            for c in checks:
+                c.check(rdp, budget(c))
+            return
+        futures = [executor.submit(lambda c: c.check(rdp, budget(c)), c) for c in checks]
+        for f in futures:
+            f.result()
+
+    async def acheck_all(self, rdp, concurrency=None, timeout=None, deadline=None,
+                         plan=False):
+        """ Runs all checks for an RDP from an asyncio event loop
+            (see Check.acheck)
+
+        Arguments
+        ---------
+        rdp: Rdp
+            Research Data Product to be checked
+        concurrency: int or asyncio.Semaphore
+            Maximum number of checks running at the same time (a semaphore
+            may be shared between calls), None runs all checks at once
+        timeout: float
+            Time budget of each check in seconds (the timeout of a check
+            applies as well)
+        deadline: float
+            Time budget of all checks in seconds (see check_all)
+        plan: bool
+            Whether only the checks needed to score the RDP run (see plan)
+        """
+        import asyncio
+        if isinstance(concurrency, int):
+            concurrency = asyncio.Semaphore(concurrency)
+        budget = self._budgeted(deadline)
+        def timeout_of(c):
+            t = budget(c)
+            if timeout is None:
+                return t
+            return timeout if t is None else min(timeout, t)
+        async def run(c):
+            if concurrency is None:
+                return await c.acheck(rdp, timeout_of(c))
+            async with concurrency:
+                return await c.acheck(rdp, timeout_of(c))
+        await asyncio.gather(*(run(c) for c in self._planned(rdp, plan)))
+
+    def _budgeted(self, deadline):
+        """ Returns a function returning the time budget of a check started
+            now (None if neither deadline nor the check's timeout are set)
+        """
+        end = None if deadline is None else time.monotonic() + deadline
+        def budget(c):
+            if end is None:
+                return c.timeout
+            remaining = end - time.monotonic()
+            return remaining if c.timeout is None else min(remaining, c.timeout)
+        return budget
+
+    def check_batch(self, rdps, plan=False):
+        """ Runs all checks for several RDPs, each check processes the RDPs
+            as one batch (see Check.check_many). With plan, each check only
+            processes the RDPs it is needed for (see plan).
+        """
+        rdps = list(rdps)
+        if not plan:
+            self.checks_run += len(self.checks) * len(rdps)
+            for c in self.checks:
+                c.check_many(rdps)
+            return
+        batches = {c.id: [] for c in self.checks}
+        for rdp in rdps:
+            for c in self._planned(rdp, plan):
+                batches[c.id].append(rdp)
         for c in self.checks:
-            c.check(rdp)
+            if len(batches[c.id]) > 0:
+                c.check_many(batches[c.id])
 
-    def score(self, rdp):
+    def score(self, rdp, lazy=False, deadline=None):
         """ Returns the score for a given RDP (each evaluation has the same weight)
 
+        Arguments
+        ---------
+        rdp: Rdp
+            Research Data Product to be scored
+        lazy: bool
+            Whether checks run on demand while scoring, evaluation by
+            evaluation and cheapest first (by cost_ns). The remaining checks
+            of an evaluation do not run once one of its checks failed, and
+            checks of skipped evaluations never run. Otherwise the checks
+            must have run before (e.g. by check_all).
+        deadline: float
+            Time budget of all checks in seconds if lazy (see check_all)
         """
-        score = 0
-        numberOfEvalutations = 0
+        if lazy:
+            budget = self._budgeted(deadline)
+            ran = set()
+        evaluations = []
         for e in self.evaluations:
             if self.skip(e, rdp):
                 continue
-            numberOfEvalutations+= 1
-            score += e.evaluate(rdp.pid)
-        return round(score/numberOfEvalutations, self.rounded)
+            if lazy:
+                self._demand(e, rdp, budget, ran)
+            evaluations.append(e.evaluate(rdp.pid))
+        if lazy:
+            self.checks_run += len(ran)
+            self.checks_saved += len(self.checks) - len(ran)
+        return self.aggregate(evaluations)
+
+    def aggregate(self, evaluations):
+        """ Returns the score for the results of the evaluations which are not
+            skipped (see aggregation_info)
+
+        Arguments
+        ---------
+        evaluations: list
+            Results of the evaluations (in the order of self.evaluations)
+        """
+        return round(sum(evaluations)/len(evaluations), self.rounded)
+
+    def _demand(self, evaluation, rdp, budget, ran):
+        """ Runs the checks of an evaluation (cheapest first) which did not
+            run yet while scoring until one fails
+        """
+        for c in sorted(evaluation.checks, key=lambda c: c.cost_ns or 0):
+            if id(c) not in ran:
+                c.check(rdp, budget(c))
+                ran.add(id(c))
+            if not c.get_last_result(rdp.pid).success:
+                return
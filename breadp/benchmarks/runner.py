@@ -0,0 +1,356 @@
+################################################################################
+# Copyright: Tobias Weber 2020
+#
+# Apache 2.0 License
+#
+# This file contains code to run benchmarks over a corpus of RDPs
+#
+################################################################################
+
+import asyncio
+from multiprocessing import Pool
+import sys
+
+from rdp import RdpFactory
+
+from breadp.checks import metadata
+from breadp.checks.result import compact, load
+from breadp.reports import BenchmarkReport, CheckReport, EvaluationReport, Report
+from breadp.util.cache import Cache
+from breadp.util.log import CheckLogEntry, KeepLastNPolicy, nanoseconds
+
+# The benchmark of a worker process (built once per worker)
+_benchmark = None
+_service = None
+_deadline = None
+_plan = True
+_lazy = False
+
+def run_corpus(items, benchmark_class, processes=None, service="zenodo",
+               chunksize=1, retention=None, deadline=None, plan=True,
+               lazy=False, result_cache=None, language_cache=None):
+    """ Scores a corpus of RDPs in a pool of worker processes.
+        Each worker builds the benchmark once and reuses it for all RDPs
+        it processes.
+
+    Arguments
+    ---------
+    items: iterable
+        PIDs (str) or RDPs to be scored, or reports (dict) of a previous run
+        to be brought up to date incrementally (see rescore)
+    benchmark_class: type
+        Benchmark to run (e.g. BPGBenchmark), called without arguments
+    processes: int
+        Number of worker processes (defaults to the number of CPUs)
+    service: str
+        Service the RDPs are created from if PIDs are given
+    chunksize: int
+        Number of items sent to a worker at once
+    retention: RetentionPolicy
+        Retention policy of the check logs in the workers (defaults to
+        keeping only the last entry of each check)
+    deadline: float
+        Time budget of all checks of an RDP in seconds (see
+        Benchmark.check_all)
+    plan: bool
+        Whether only the checks needed to score an RDP run (see
+        Benchmark.plan), the reports list the others as skipped_checks
+    lazy: bool
+        Whether checks run on demand while scoring (see Benchmark.score),
+        implies plan
+    result_cache: str
+        Path of an SQLite database the results of the checks are cached in
+        and reused from by all workers (see Check.results), None does not
+        cache results
+    language_cache: str
+        Path of an SQLite database the languages detected by the checks are
+        cached in and shared by all workers (see
+        metadata.configure_language_cache), None caches them per worker
+
+    Yields
+    ------
+    dict
+        BenchmarkReport.todict() of each RDP in the order of completion or,
+        if an RDP could not be scored, a dict with the keys "pid" and "error"
+    """
+    if retention is None:
+        retention = KeepLastNPolicy(1)
+    initargs = (benchmark_class, service, retention, deadline, plan, lazy,
+                result_cache, language_cache)
+    with Pool(processes, _init_worker, initargs) as pool:
+        for report in pool.imap_unordered(_score, items, chunksize):
+            yield report
+
+async def arun_corpus(items, benchmark, concurrency=100, timeout=None,
+                      service="zenodo", deadline=None, plan=True):
+    """ Scores a corpus of RDPs concurrently from the running event loop
+        with one benchmark (see Benchmark.acheck_all). RDPs are created (and
+        their metadata retrieved) in the loop's default executor.
+
+    Arguments
+    ---------
+    items: iterable
+        PIDs (str) or RDPs to be scored
+    benchmark: Benchmark
+        Benchmark to run
+    concurrency: int
+        Maximum number of RDPs scored at the same time
+    timeout: float
+        Time budget of each check in seconds (None waits forever)
+    service: str
+        Service the RDPs are created from if PIDs are given
+    deadline: float
+        Time budget of all checks of an RDP in seconds
+    plan: bool
+        Whether only the checks needed to score an RDP run
+
+    Yields
+    ------
+    dict
+        BenchmarkReport.todict() of each RDP in the order of completion or,
+        if an RDP could not be scored, a dict with the keys "pid" and "error"
+    """
+    pending = set()
+    for item in items:
+        pending.add(asyncio.ensure_future(
+            ascore(benchmark, item, service, timeout, deadline, plan)
+        ))
+        if len(pending) >= concurrency:
+            done, pending = await asyncio.wait(
+                pending,
+                return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                yield task.result()
+    while pending:
+        done, pending = await asyncio.wait(
+            pending,
+            return_when=asyncio.FIRST_COMPLETED
+        )
+        for task in done:
+            yield task.result()
+
+def _init_worker(benchmark_class, service, retention, deadline, plan, lazy,
+                 result_cache, language_cache):
+    global _benchmark, _service, _deadline, _plan, _lazy
+    _benchmark = benchmark_class()
+    _benchmark.set_retention(retention)
+    if result_cache is not None:
+        _benchmark.set_result_cache(
+            Cache(maxsize=10000, path=result_cache, namespace="results")
+        )
+    if language_cache is not None:
+        metadata.configure_language_cache(path=language_cache)
+    _service = service
+    _deadline = deadline
+    _plan = plan
+    _lazy = lazy
+
+def _score(item):
+    return score(_benchmark, item, _service, _deadline, _plan, _lazy)
+
+def score(benchmark, item, service="zenodo", deadline=None, plan=True,
+          lazy=False):
+    """ Runs all checks of the benchmark for a PID or an RDP and returns
+        the report as dict (or a dict with the keys "pid" and "error").
+        With lazy, checks run on demand while scoring (see Benchmark.score).
+        A report (dict) of a previous run is updated (see rescore).
+    """
+    try:
+        if isinstance(item, dict):
+            if "error" in item:
+                return score(benchmark, item["pid"], service, deadline, plan, lazy)
+            return rescore(benchmark, item, service, deadline, plan)
+        rdp = RdpFactory.create(item, service) if isinstance(item, str) else item
+        with benchmark.hold(rdp.pid):
+            if lazy:
+                benchmark.score(rdp, lazy=True, deadline=deadline)
+            else:
+                benchmark.check_all(rdp, deadline=deadline, plan=plan)
+            return BenchmarkReport(rdp, benchmark).todict()
+    except Exception as e:
+        return _error(item, e)
+
+def rescore(benchmark, report, service="zenodo", deadline=None, plan=True,
+            rdp=None):
+    """ Brings a report (dict) of a previous run of the benchmark up to date
+        with the current definition of the benchmark and returns it
+        (incremental re-benchmarking):
+
+        - only checks without a successful result in the report from a check
+          of the same id and version run again (failures, e.g. timeouts, and
+          unsuccessful results of network checks run again as well)
+        - only evaluations which are new, have another version or depend on a
+          check which ran again are recomputed, the other evaluation reports
+          are taken from the report
+        - the score is only recomputed if an evaluation was recomputed, the
+          evaluations changed or the benchmark has another version
+
+        Results of checks taken from the report are added to the check logs
+        if a recomputed evaluation needs them. Skip predicates are assumed to
+        be unchanged unless the benchmark has another version. The RDP is
+        only created (and its metadata retrieved) if a check or a skip
+        predicate must run. The key "recomputed" of the returned report lists
+        the ids of the checks and evaluations which were recomputed and
+        whether the score was recomputed.
+
+    Arguments
+    ---------
+    benchmark: Benchmark
+        Current benchmark
+    report: dict
+        BenchmarkReport.todict() of a previous run
+    service: str
+        Service the RDP is created from (from the report's pid)
+    deadline: float
+        Time budget of the checks which run in seconds
+    plan: bool
+        Whether only checks needed to score the RDP run (see Benchmark.plan)
+    rdp: Rdp
+        RDP of the report (created on demand if not given)
+    """
+    pid = report["pid"]
+    rdps = [rdp]
+    def get_rdp():
+        if rdps[0] is None:
+            rdps[0] = RdpFactory.create(pid, service)
+        return rdps[0]
+    same_benchmark = report["version"] == benchmark.version
+    check_reports = {r["id"]: r for r in report["check_reports"]}
+    evaluation_reports = {r["id"]: r for r in report["evaluation_reports"]}
+    skipped_evaluations = report.get("skipped_evaluations")
+    # Evaluations (with their previous reports) which are not skipped
+    evaluations = []
+    skipped = []
+    for e in benchmark.evaluations:
+        previous = evaluation_reports.get(e.id)
+        if same_benchmark and previous is not None:
+            is_skipped = False
+        elif same_benchmark and skipped_evaluations is not None \
+                and e.id in skipped_evaluations:
+            is_skipped = True
+        else:
+            is_skipped = benchmark.skip(e, get_rdp())
+        if is_skipped:
+            skipped.append(e.id)
+        else:
+            evaluations.append((e, previous))
+    needed = {c.id for e, _ in evaluations for c in e.checks}
+    stale = [
+        c for c in benchmark.checks
+        if (not plan or c.id in needed) and not _current(c, check_reports.get(c.id))
+    ]
+    stale_ids = {c.id for c in stale}
+    with benchmark.hold(pid):
+        if stale:
+            benchmark.check_all(get_rdp(), deadline=deadline, checks=stale)
+        else:
+            benchmark.checks_saved += len(benchmark.checks)
+        evaluation_dicts = []
+        recomputed_evaluations = []
+        for e, previous in evaluations:
+            if previous is not None and previous["version"] == e.version \
+                    and not any(c.id in stale_ids for c in e.checks):
+                evaluation_dicts.append(previous)
+                continue
+            for c in e.checks:
+                if c.get_last_result(pid) is None and c.id in check_reports:
+                    _restore(c, pid, check_reports[c.id])
+            evaluation_dicts.append(EvaluationReport(pid, e).todict())
+            recomputed_evaluations.append(e.id)
+        check_dicts = []
+        skipped_checks = []
+        for c in benchmark.checks:
+            if c.id in stale_ids:
+                check_dicts.append(CheckReport(pid, c).todict())
+            elif c.id in check_reports and (not plan or c.id in needed):
+                check_dicts.append(check_reports[c.id])
+            else:
+                skipped_checks.append(c.id)
+    recompute_score = len(recomputed_evaluations) > 0 or not same_benchmark \
+        or [e.id for e, _ in evaluations] != [r["id"] for r in report["evaluation_reports"]]
+    rv = Report(benchmark.id, benchmark.name, benchmark.version,
+                benchmark.description).todict()
+    rv["rounded"] = benchmark.rounded
+    if recompute_score:
+        rv["score"] = benchmark.aggregate([r["evaluation"] for r in evaluation_dicts])
+    else:
+        rv["score"] = report["score"]
+    rv["pid"] = pid
+    rv["aggregation_info"] = benchmark.aggregation_info()
+    rv["precision"] = sys.float_info.mant_dig if recompute_score else report["precision"]
+    rv["evaluation_reports"] = evaluation_dicts
+    rv["check_reports"] = check_dicts
+    rv["skipped_checks"] = skipped_checks
+    rv["skipped_evaluations"] = skipped
+    rv["recomputed"] = {
+        "checks": [c.id for c in stale],
+        "evaluations": recomputed_evaluations,
+        "score": recompute_score
+    }
+    return rv
+
+def _current(check, check_report):
+    """ Returns whether the check report holds a reusable result of the
+        check (an unsuccessful result of a network check, e.g. an
+        unreachable host, is not reusable)
+    """
+    return check_report is not None \
+        and check_report["version"] == check.version \
+        and check_report.get("result_type") not in (None, "FailureResult") \
+        and (check_report["success"] or not check.network)
+
+def _restore(check, pid, check_report):
+    """ Adds the result of a check report to the log of the check
+    """
+    start_ns = nanoseconds(check_report["start"])
+    result = load([
+        check_report["result_type"],
+        check_report["result"],
+        check_report["msg"],
+        check_report["success"]
+    ])
+    check.log.add(CheckLogEntry(
+        start_ns,
+        start_ns + check_report["duration_ns"],
+        pid,
+        compact(result)
+    ))
+
+async def ascore(benchmark, item, service="zenodo", timeout=None,
+                 deadline=None, plan=True):
+    """ Like score, but runs the checks from the running event loop
+    """
+    try:
+        if isinstance(item, str):
+            rdp = await asyncio.get_running_loop().run_in_executor(
+                None,
+                _create,
+                item,
+                service
+            )
+        else:
+            rdp = item
+        with benchmark.hold(rdp.pid):
+            await benchmark.acheck_all(
+                rdp,
+                timeout=timeout,
+                deadline=deadline,
+                plan=plan
+            )
+            return BenchmarkReport(rdp, benchmark).todict()
+    except Exception as e:
+        return _error(item, e)
+
+def _create(pid, service):
+    rdp = RdpFactory.create(pid, service)
+    # Retrieve the metadata here, so that they are not retrieved in the loop
+    rdp.metadata
+    return rdp
+
+def _error(item, e):
+    if isinstance(item, dict):
+        pid = item["pid"]
+    else:
+        pid = item if isinstance(item, str) else item.pid
+    return {"pid": pid, "error": "{}: {}".format(type(e).__name__, e)}
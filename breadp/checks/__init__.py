@@ -7,12 +7,15 @@
 #
 ################################################################################
 
+import hashlib
 import inspect
-from datetime import datetime
+import json
+import threading
+import time
 from rdp.exceptions import CannotCreateRDPException
 
 from breadp.util.log import Log, CheckLogEntry
-from breadp.checks.result import CheckResult
+from breadp.checks.result import CheckResult, compact, dump, FailureResult, load
 
 class Check(object):
     """ Base class and interface for checks for RDPs
@@ -27,6 +30,23 @@ class Check(object):
         A short text describing the criterion checked (in English)
     type: str
         Indicates whether the check is deterministic or random
+    timeout: float
+        Time budget of a run of the check in seconds (None waits forever)
+    cost_ns: float
+        Exponentially weighted moving average of the durations of the runs
+        of the check in nanoseconds (None before the first run)
+    fields: tuple
+        Attributes of the RDP the check reads, e.g. "metadata.titles" (None
+        if unknown, then results are never reused)
+    network: bool
+        Whether the check sends requests
+    results: Cache
+        Cache of results keyed by id, version and a hash of the fields of
+        the RDP (None does not cache). Results of deterministic checks
+        without network requests are reused, other results only if
+        result_ttl is set.
+    result_ttl: float
+        Seconds the results of random or network checks are reused
     log: Log
         List of log entries of run checks
         (includes keys "start", "end", "state", "version", "pid", "msg")
@@ -34,13 +54,23 @@ class Check(object):
 
     Methods
     -------
-    check(self, rdp) -> None
+    check(self, rdp, timeout) -> None
         Runs the check and updates log and state
+    check_many(self, rdps) -> None
+        Runs the check for several RDPs and updates log and state
+    acheck(self, rdp, timeout) -> None
+        Runs the check from an event loop and updates log and state
     """
 
     def __init__(self):
         self.log = Log()
         self.type = "deterministic"
+        self.timeout = None
+        self.cost_ns = None
+        self.fields = None
+        self.network = False
+        self.results = None
+        self.result_ttl = None
 
     @property
     def description(self):
@@ -50,37 +80,249 @@ class Check(object):
     def name(self):
         return type(self).__name__
 
-    def check(self, rdp):
+    def check(self, rdp, timeout=None):
         """ Wrapper code around each check
-        Sets start and end time, handles, success, and exceptions.
+        Records start and end time (and the monotonic duration) in
+        nanoseconds, handles, success, and exceptions. Results known without
+        running the check (see _known_result) are returned right away,
+        otherwise a check with a time budget runs in a separate thread. If
+        it does not finish in time it results in a FailureResult; the thread
+        is not interrupted, though, it keeps running (daemonic) until
+        _do_check returns, which network checks bound by the timeout of
+        their requests.
 
         Parameters
         ----------
         rdp: Rdp
             Research Data Product to be checked
+        timeout: float
+            Time budget of the check in seconds (defaults to self.timeout)
         """
-        start = datetime.utcnow().isoformat()
-        result = (self._do_check(rdp))
-
-        end = datetime.utcnow().isoformat()
-        msg = result.msg
-        self.log.add(
-            CheckLogEntry(
-                start,
-                end,
-                rdp.pid,
-                result
-            )
-        )
+        if timeout is None:
+            timeout = self.timeout
+        start_ns = time.time_ns()
+        counter_ns = time.perf_counter_ns()
+        key = self._result_key(rdp)
+        result = self._cached_result(key)
+        if result is None:
+            result = self._known_result(rdp)
+            if result is None and timeout is None:
+                result = self._do_check(rdp)
+            elif result is None:
+                result = self._do_check_within(rdp, timeout)
+            result = compact(result)
+            self._cache_result(key, result)
+        duration_ns = time.perf_counter_ns() - counter_ns
+        self._record_cost(duration_ns)
+        self.log.add(CheckLogEntry(start_ns, start_ns + duration_ns, rdp.pid, result))
+
+    def check_many(self, rdps):
+        """ Wrapper code around checking several RDPs at once
+        Checks that override _do_check_many process the RDPs as one batch,
+        all entries of a batch record the start of the batch and the batch's
+        duration divided by the number of RDPs. Other checks run check for
+        each RDP.
+
+        Parameters
+        ----------
+        rdps: iterable
+            Research Data Products to be checked
+        """
+        if type(self)._do_check_many is Check._do_check_many:
+            for rdp in rdps:
+                self.check(rdp)
+            return
+        rdps = list(rdps)
+        if len(rdps) == 0:
+            return
+        start_ns = time.time_ns()
+        counter_ns = time.perf_counter_ns()
+        keys = [self._result_key(rdp) for rdp in rdps]
+        results = [self._cached_result(key) for key in keys]
+        missing = [rdp for rdp, result in zip(rdps, results) if result is None]
+        computed = iter(self._do_check_many(missing) if missing else ())
+        for i, key in enumerate(keys):
+            if results[i] is None:
+                results[i] = compact(next(computed))
+                self._cache_result(key, results[i])
+        duration_ns = (time.perf_counter_ns() - counter_ns) // len(rdps)
+        self._record_cost(duration_ns)
+        end_ns = start_ns + duration_ns
+        for rdp, result in zip(rdps, results):
+            self.log.add(CheckLogEntry(start_ns, end_ns, rdp.pid, result))
+
+    async def acheck(self, rdp, timeout=None):
+        """ Wrapper code around each check run from an asyncio event loop
+        Checks without an asynchronous implementation (_ado_check) run in the
+        loop's default executor. A check which does not finish within timeout
+        seconds results in a FailureResult (an executor thread running a
+        synchronous check is not interrupted, though).
+
+        Parameters
+        ----------
+        rdp: Rdp
+            Research Data Product to be checked
+        timeout: float
+            Time budget of the check in seconds (defaults to self.timeout)
+        """
+        import asyncio
+        if timeout is None:
+            timeout = self.timeout
+        start_ns = time.time_ns()
+        counter_ns = time.perf_counter_ns()
+        key = self._result_key(rdp)
+        result = self._cached_result(key)
+        if result is None:
+            result = self._known_result(rdp)
+            if result is not None:
+                result = compact(result)
+                self._cache_result(key, result)
+        if result is None and timeout is not None and timeout <= 0:
+            result = self._timeout_result(timeout)
+        elif result is None:
+            try:
+                result = compact(await asyncio.wait_for(self._ado_check(rdp), timeout))
+                self._cache_result(key, result)
+            except asyncio.TimeoutError:
+                result = self._timeout_result(timeout)
+        duration_ns = time.perf_counter_ns() - counter_ns
+        self._record_cost(duration_ns)
+        self.log.add(CheckLogEntry(start_ns, start_ns + duration_ns, rdp.pid, result))
 
     def get_last_result(self, pid):
         """ Returns the last result of the check for the given pid.
             Returns None if no check did run yet.
         """
-        try:
-            return self.log.get_by_pid(pid)[-1].result
-        except IndexError:
+        le = self.log.get_last_by_pid(pid)
+        if le is None:
             return None
+        return le.result
+
+    def _known_result(self, rdp):
+        """ Returns the result for the given RDP if it is known without
+            running _do_check or _ado_check, e.g. from a cache of the check
+            (None otherwise). check and acheck return it right away, without
+            starting a thread or waiting for a time budget.
+        """
+        return None
 
     def _do_check(self, rdp):
         raise NotImplementedError("_do_check must be implemented by subclasses of Check")
+
+    async def _ado_check(self, rdp):
+        """ Returns the result for the given RDP from an event loop.
+            Subclasses may override this with a native asynchronous
+            implementation, by default _do_check runs in the default executor.
+        """
+        import asyncio
+        return await asyncio.get_running_loop().run_in_executor(
+            None,
+            self._do_check,
+            rdp
+        )
+
+    def _do_check_within(self, rdp, timeout):
+        """ Returns the result of _do_check for the given RDP or, if it does
+            not finish within timeout seconds, a FailureResult
+        """
+        if timeout <= 0:
+            return self._timeout_result(timeout)
+        outcome = []
+        def run():
+            try:
+                outcome.append((self._do_check(rdp), None))
+            except BaseException as e:
+                outcome.append((None, e))
+        thread = threading.Thread(target=run, name=self.name, daemon=True)
+        thread.start()
+        thread.join(timeout)
+        if not outcome:
+            return self._timeout_result(timeout)
+        result, e = outcome[0]
+        if e is not None:
+            raise e
+        return result
+
+    def _result_key(self, rdp):
+        """ Returns the key of the result for the RDP in the result cache,
+            None if the result must not be cached
+        """
+        if self.results is None or self.fields is None:
+            return None
+        if (self.type != "deterministic" or self.network) and self.result_ttl is None:
+            return None
+        return "{}:{}:{}".format(self.id, self.version, fingerprint(rdp, self.fields))
+
+    def _cached_result(self, key):
+        if key is None:
+            return None
+        dumped = self.results.get(key)
+        return None if dumped is None else compact(load(dumped))
+
+    def _cache_result(self, key, result):
+        # Failures (e.g. timeouts) say nothing about the RDP, neither do
+        # unsuccessful results of network checks (e.g. unreachable hosts)
+        if key is None or isinstance(result, FailureResult):
+            return
+        if self.network and not result.success:
+            return
+        ttl = None
+        if self.type != "deterministic" or self.network:
+            ttl = self.result_ttl
+        self.results.put(key, dump(result), ttl=ttl)
+
+    def _record_cost(self, duration_ns, weight=0.2):
+        if self.cost_ns is None:
+            self.cost_ns = float(duration_ns)
+        else:
+            self.cost_ns += weight * (duration_ns - self.cost_ns)
+
+    def _timeout_result(self, timeout):
+        if timeout <= 0:
+            msg = "Timeout: no time left to run {}".format(self.name)
+        else:
+            msg = "Timeout: {} did not finish within {:g}s".format(self.name, timeout)
+        return FailureResult(msg)
+
+    def _do_check_many(self, rdps):
+        """ Returns the results for the given list of RDPs (in the same order).
+            Subclasses may override this to process a batch in one pass.
+        """
+        return [self._do_check(rdp) for rdp in rdps]
+
+def fingerprint(rdp, fields):
+    """ Returns a hash of the given attributes (e.g. "metadata.titles") of an
+        RDP
+    """
+    values = []
+    for field in fields:
+        value = rdp
+        for name in field.split("."):
+            value = getattr(value, name, None)
+        values.append(_canonical(value, set()))
+    return hashlib.sha256(
+        json.dumps(values, sort_keys=True, default=repr).encode("utf-8")
+    ).hexdigest()
+
+def _canonical(value, seen):
+    """ Returns a JSON serializable representation of a value (objects are
+        represented by their type and attributes)
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if id(value) in seen:
+        return "<cycle>"
+    seen = seen | {id(value)}
+    if isinstance(value, dict):
+        return {str(k): _canonical(v, seen) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v, seen) for v in value]
+    if isinstance(value, (set, frozenset)):
+        return sorted((_canonical(v, seen) for v in value), key=repr)
+    attributes = getattr(value, "__dict__", None)
+    if attributes is None:
+        slots = getattr(type(value), "__slots__", ())
+        attributes = {a: getattr(value, a, None) for a in slots}
+    if not attributes:
+        return repr(value)
+    return [type(value).__name__, _canonical(attributes, seen)]
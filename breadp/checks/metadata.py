@@ -6,22 +6,34 @@
 # This file contains all code related for metadata checks
 #
 ################################################################################
-import json
-from langdetect import detect, DetectorFactory
-from langdetect.lang_detect_exception import LangDetectException
-import os
-import pandas as pd
+from hashlib import sha256
 from rdp.services.capacities import RetrieveDataHttpHeaders
 import re
-import requests
 import sys
+import threading
 
-DetectorFactory.seed = 0
-
+from breadp import CircuitOpenException
 from breadp.checks import Check
 from breadp.checks.result import BooleanResult, \
         ListResult, \
         MetricResult
+from breadp.util import net, reference
+from breadp.util.cache import Cache
+
+_FILE_NAME_PATTERN = re.compile(r"^\s*\S+\.\S+\s*$")
+_BYTE_SIZE_PATTERN = re.compile(
+    r"^\d+\s*(k|m|g|t|p|e|z|y){0,1}i{0,1}b$",
+    re.IGNORECASE
+)
+# detect function and exception of langdetect (imported on first use)
+_langdetect_api = None
+_langdetect_lock = threading.Lock()
+_MISSING = object()
+
+# Languages detected by detect_languages keyed by a hash of the normalized
+# text, shared by all checks (see configure_language_cache). Texts whose
+# language cannot be detected are cached for a day.
+language_cache = Cache(maxsize=100000, negative_ttl=86400, namespace="languages")
 
 class DescriptionsNumberCheck(Check):
     """ Checks the number of descriptions in the metadata for an RDP
@@ -35,6 +47,7 @@ class DescriptionsNumberCheck(Check):
         Check.__init__(self)
         self.id = 2
         self.version = "0.0.1"
+        self.fields = ("metadata.descriptions",)
 
     def _do_check(self, rdp):
         return MetricResult(len(rdp.metadata.descriptions), "", True)
@@ -51,6 +64,7 @@ class DescriptionsLengthCheck(Check):
         Check.__init__(self)
         self.id = 3
         self.version = "0.0.1"
+        self.fields = ("metadata.descriptions",)
 
     def _do_check(self, rdp):
         lengths = []
@@ -72,17 +86,26 @@ class DescriptionsLanguageCheck(Check):
         Check.__init__(self)
         self.id = 4
         self.version = "0.0.1"
+        self.fields = ("metadata.descriptions",)
 
     def _do_check(self, rdp):
-        languages = []
-        msg = "No descriptions retrievable"
-        for d in rdp.metadata.descriptions:
-            msg = ""
-            try:
-                languages.append(detect(d.text))
-            except LangDetectException:
-                languages.append(None)
-        return ListResult(languages, msg, True)
+        return self._do_check_many([rdp])[0]
+
+    def _do_check_many(self, rdps):
+        languages = detect_languages(
+            d.text for rdp in rdps for d in rdp.metadata.descriptions
+        )
+        results = []
+        for rdp in rdps:
+            msg = "No descriptions retrievable"
+            if len(rdp.metadata.descriptions) > 0:
+                msg = ""
+            results.append(ListResult(
+                [languages[d.text] for d in rdp.metadata.descriptions],
+                msg,
+                True
+            ))
+        return results
 
 class DescriptionsTypeCheck(Check):
     """ Checks all description types of DataCite metadata
@@ -97,6 +120,7 @@ class DescriptionsTypeCheck(Check):
         Check.__init__(self)
         self.id = 5
         self.version = "0.0.1"
+        self.fields = ("metadata.descriptions",)
 
     def _do_check(self, rdp):
         types = []
@@ -119,6 +143,7 @@ class TitlesNumberCheck(Check):
         Check.__init__(self)
         self.id = 6
         self.version = "0.0.1"
+        self.fields = ("metadata.titles",)
 
     def _do_check(self, rdp):
         if not rdp.metadata.titles:
@@ -138,6 +163,7 @@ class TitlesLengthCheck(Check):
         Check.__init__(self)
         self.id = 7
         self.version = "0.0.1"
+        self.fields = ("metadata.titles",)
 
     def _do_check(self, rdp):
         lengths = []
@@ -159,17 +185,26 @@ class TitlesLanguageCheck(Check):
         Check.__init__(self)
         self.id = 8
         self.version = "0.0.1"
+        self.fields = ("metadata.titles",)
 
     def _do_check(self, rdp):
-        languages = []
-        msg = "No titles retrievable"
-        for t in rdp.metadata.titles:
-            msg = ""
-            try:
-                languages.append(detect(t.text))
-            except LangDetectException:
-                languages.append(None)
-        return ListResult(languages, msg, True)
+        return self._do_check_many([rdp])[0]
+
+    def _do_check_many(self, rdps):
+        languages = detect_languages(
+            t.text for rdp in rdps for t in rdp.metadata.titles
+        )
+        results = []
+        for rdp in rdps:
+            msg = "No titles retrievable"
+            if len(rdp.metadata.titles) > 0:
+                msg = ""
+            results.append(ListResult(
+                [languages[t.text] for t in rdp.metadata.titles],
+                msg,
+                True
+            ))
+        return results
 
 class TitlesJustAFileNameCheck(Check):
     """ Checks whether the titles are (probably) just a file names
@@ -184,20 +219,31 @@ class TitlesJustAFileNameCheck(Check):
         Check.__init__(self)
         self.id = 9
         self.version = "0.0.1"
+        self.fields = ("metadata.titles",)
 
     def _do_check(self, rdp):
-        bools = []
-        msg = ""
-        if len(rdp.metadata.titles) == 0:
-            msg = "No titles retrievable"
-        for t in rdp.metadata.titles:
+        return self._do_check_many([rdp])[0]
+
+    def _do_check_many(self, rdps):
+        file_names = matching_texts(
+            _FILE_NAME_PATTERN,
+            (t.text for rdp in rdps for t in rdp.metadata.titles)
+        )
+        results = []
+        for rdp in rdps:
+            bools = []
             msg = ""
-            if re.match(r"^\s*\S+\.\S+\s*$", t.text):
-                msg += "{} is probably just a file name;".format(t.text)
-                bools.append(True)
-            else:
-                bools.append(False)
-        return ListResult(bools, msg, True)
+            if len(rdp.metadata.titles) == 0:
+                msg = "No titles retrievable"
+            for t in rdp.metadata.titles:
+                msg = ""
+                if t.text in file_names:
+                    msg += "{} is probably just a file name;".format(t.text)
+                    bools.append(True)
+                else:
+                    bools.append(False)
+            results.append(ListResult(bools, msg, True))
+        return results
 
 class TitlesTypeCheck(Check):
     """ Checks the types of all titles (None if not given)
@@ -211,6 +257,7 @@ class TitlesTypeCheck(Check):
         Check.__init__(self)
         self.id = 10
         self.version = "0.0.1"
+        self.fields = ("metadata.titles",)
 
     def _do_check(self, rdp):
         types = []
@@ -234,26 +281,28 @@ class FormatsAreValidMediaTypeCheck(Check):
         Check.__init__(self)
         self.id = 12
         self.version = "0.0.1"
+        self.fields = ("metadata.formats",)
 
     def _do_check(self, rdp):
-        valid = []
-        iana_file_path = os.path.join(
-            os.path.dirname(os.path.abspath(__file__)),
-            'resources',
-            'mediatypes.csv'
-        )
-        iana = pd.read_csv(iana_file_path)
-        if len(rdp.metadata.formats) == 0:
-            msg = "No formats found!"
-        else:
-            msg= ""
-        for f in rdp.metadata.formats:
-            if f not in iana.Template.tolist():
-                msg += "{} is not a valid format ".format(f)
-                valid.append(False)
+        return self._do_check_many([rdp])[0]
+
+    def _do_check_many(self, rdps):
+        templates = reference.media_types()
+        results = []
+        for rdp in rdps:
+            valid = []
+            if len(rdp.metadata.formats) == 0:
+                msg = "No formats found!"
             else:
-                valid.append(True)
-        return ListResult(valid, msg, True)
+                msg= ""
+            for f in rdp.metadata.formats:
+                if f not in templates:
+                    msg += "{} is not a valid format ".format(f)
+                    valid.append(False)
+                else:
+                    valid.append(True)
+            results.append(ListResult(valid, msg, True))
+        return results
 
 class RightsHaveValidSPDXIdentifierCheck(Check):
     """ Checks whether all rights have valid SPDX licenses identifiers
@@ -269,21 +318,15 @@ class RightsHaveValidSPDXIdentifierCheck(Check):
         Check.__init__(self)
         self.id = 13
         self.version = "0.0.1"
-        spdxFilePath = os.path.join(
-            os.path.dirname(os.path.abspath(__file__)),
-            'resources',
-            'licenses.json'
-        )
-        with open(spdxFilePath, "r") as f:
-            licenses_dict = json.load(f)
-        self.licenses = pd.DataFrame(licenses_dict["licenses"])
+        self.fields = ("metadata.rights",)
 
     def _do_check(self, rdp):
+        licenses = reference.spdx_identifiers()
         valid = []
         msg = "No rights objects found!"
         for r in rdp.metadata.rights:
             msg = ""
-            if r.spdx not in self.licenses.licenseId.tolist():
+            if r.spdx not in licenses:
                 msg += "{} is not a valid SPDX identifier".format(r.spdx)
                 valid.append(False)
             else:
@@ -294,35 +337,112 @@ class RightsHasAtLeastOneLicenseCheck(Check):
     """ Checks whether at least one license statement is among the rights
         of the metadata of the RDP
 
+    Attributes
+    ----------
+    cache: Cache
+        Status codes (or errors) of probed license URIs, failures expire
+        after ten minutes, status codes after a day
+
     Methods
     -------
     _do_check(self, rdp)
         returns a BooleanResult, indicating whether there is a license statement
+    _ado_check(self, rdp)
+        returns a BooleanResult (asynchronously)
     """
     def __init__(self):
         Check.__init__(self)
         self.id = 14
         self.version = "0.0.1"
+        self.fields = ("metadata.rights",)
+        self.network = True
+        self.timeout = 60
+        self.cache = Cache(maxsize=1024, ttl=24 * 3600, negative_ttl=600)
 
     def _do_check(self, rdp):
-        msg = ""
-        if len(rdp.metadata.rights) == 0:
-            msg = "No rights specified"
+        probing = self._probing(rdp)
+        try:
+            uri = next(probing)
+            while True:
+                try:
+                    outcome = net.head(uri).status_code
+                except Exception as e:
+                    outcome = e
+                uri = probing.send(outcome)
+        except StopIteration as stop:
+            return stop.value
+
+    async def _ado_check(self, rdp):
+        probing = self._probing(rdp)
+        try:
+            uri = next(probing)
+            while True:
+                try:
+                    outcome = (await net.ahead(uri)).status_code
+                except Exception as e:
+                    outcome = e
+                uri = probing.send(outcome)
+        except StopIteration as stop:
+            return stop.value
+
+    def _probing(self, rdp):
+        """ generator yielding the license URIs to probe (which are not
+            cached), the status code or exception of each probe is sent
+            back. Returns the result once a license was found or all URIs
+            were probed.
+        """
+        probes = []
+        failure = None
+        for uri in self._license_uris(rdp):
+            probe = self.cache.get(uri)
+            if probe is None:
+                outcome = yield uri
+                if isinstance(outcome, CircuitOpenException):
+                    # Failing fast is not a result of probing the URI
+                    failure = "{}: {}".format(type(outcome).__name__, outcome)
+                    continue
+                probe = outcome
+                if isinstance(outcome, Exception):
+                    probe = "{}: {}".format(type(outcome), outcome)
+                self._remember(uri, probe)
+            probes.append(probe)
+            if _is_license_status(probe):
+                break
+        return self._result(rdp, probes, failure)
+
+    def _license_uris(self, rdp):
         for ro in rdp.metadata.rights:
             if not ro.uri and not str(ro.uri).startswith("info:eu-repo"):
                 continue
-            try:
-                response = requests.head(ro.uri)
-                if response.status_code > 199 and response.status_code < 400:
-                    return BooleanResult(True, "", True)
-                else:
-                    msg = "No license retrievable: {}".format(response.status_code)
-                    continue
-            except Exception as e:
-                msg += "{}: {}".format(type(e), e)
-                continue
+            yield ro.uri
+
+    def _remember(self, uri, probe):
+        self.cache.put(uri, probe, negative=not _is_license_status(probe))
+
+    def _result(self, rdp, probes, failure=None):
+        """ returns the result of the probes, unsuccessful if no license
+            was found and a URI could not be probed (failure)
+        """
+        msg = ""
+        if len(rdp.metadata.rights) == 0:
+            msg = "No rights specified"
+        for probe in probes:
+            if _is_license_status(probe):
+                return BooleanResult(True, "", True)
+            if isinstance(probe, str):
+                msg += probe
+            else:
+                msg = "No license retrievable: {}".format(probe)
+        if failure is not None:
+            return BooleanResult(False, failure, False)
         return BooleanResult(False, msg, True)
 
+def _is_license_status(probe):
+    """ returns whether a probe (status code or error message) of a license
+        URI found a license
+    """
+    return isinstance(probe, int) and probe > 199 and probe < 400
+
 class RightsAreOpenCheck(Check):
     """ Checks whether rights are open, i.e. their usage is not restricted in a
         way that necessitates interaction with the rightsholder.
@@ -336,6 +456,7 @@ class RightsAreOpenCheck(Check):
         Check.__init__(self)
         self.id = 30
         self.version = "0.0.1"
+        self.fields = ("metadata.rights",)
 
     def _do_check(self, rdp):
         msg = ""
@@ -359,6 +480,7 @@ class SubjectsAreQualifiedCheck(Check):
         Check.__init__(self)
         self.id = 15
         self.version = "0.0.1"
+        self.fields = ("metadata.subjects",)
 
     def _do_check(self, rdp):
         qualified = []
@@ -385,6 +507,7 @@ class SubjectsNumberCheck(Check):
         Check.__init__(self)
         self.id = 16
         self.version = "0.0.1"
+        self.fields = ("metadata.subjects",)
 
     def _do_check(self, rdp):
         return MetricResult(len(rdp.metadata.subjects), "", True)
@@ -403,6 +526,7 @@ class SubjectsHaveDdcCheck(Check):
         Check.__init__(self)
         self.id = 17
         self.version = "0.0.1"
+        self.fields = ("metadata.subjects",)
 
     def _do_check(self, rdp):
         for so in rdp.metadata.subjects:
@@ -429,6 +553,7 @@ class SubjectsHaveWikidataKeywordsCheck(Check):
         Check.__init__(self)
         self.id = 18
         self.version = "0.0.1"
+        self.fields = ("metadata.subjects",)
 
     def _do_check(self, rdp):
         for so in rdp.metadata.subjects:
@@ -457,6 +582,7 @@ class CreatorsOrcidCheck(Check):
         Check.__init__(self)
         self.id = 19
         self.version = "0.0.1"
+        self.fields = ("metadata.creators",)
 
     def _do_check(self, rdp):
         valid = []
@@ -481,6 +607,7 @@ class CreatorsFamilyAndGivenNameCheck(Check):
         Check.__init__(self)
         self.id = 20
         self.version = "0.0.1"
+        self.fields = ("metadata.creators",)
 
     def _do_check(self, rdp):
         valid = []
@@ -501,6 +628,7 @@ class CreatorsContainInstitutionsCheck(Check):
         Check.__init__(self)
         self.id = 21
         self.version = "0.0.1"
+        self.fields = ("metadata.creators",)
 
     def _do_check(self, rdp):
         institutions = []
@@ -526,6 +654,7 @@ class SizesNumberCheck(Check):
         Check.__init__(self)
         self.id = 22
         self.version = "0.0.1"
+        self.fields = ("metadata.sizes",)
 
     def _do_check(self, rdp):
             return MetricResult(len(rdp.metadata.sizes), "", True)
@@ -545,17 +674,25 @@ class SizesByteSizeCheck(Check):
         Check.__init__(self)
         self.id = 23
         self.version = "0.0.1"
+        self.fields = ("metadata.sizes",)
 
     def _do_check(self, rdp):
-        valid = []
-        msg = "no sizes specified"
-        for s in rdp.metadata.sizes:
-            msg = ""
-            if re.match(r"^\d+\s*(k|m|g|t|p|e|z|y){0,1}i{0,1}b$", s, re.IGNORECASE):
-                valid.append(True)
-            else:
-                valid.append(False)
-        return ListResult(valid, msg, True)
+        return self._do_check_many([rdp])[0]
+
+    def _do_check_many(self, rdps):
+        byte_sizes = matching_texts(
+            _BYTE_SIZE_PATTERN,
+            (s for rdp in rdps for s in rdp.metadata.sizes)
+        )
+        results = []
+        for rdp in rdps:
+            valid = []
+            msg = "no sizes specified"
+            for s in rdp.metadata.sizes:
+                msg = ""
+                valid.append(s in byte_sizes)
+            results.append(ListResult(valid, msg, True))
+        return results
 
 class VersionSpecifiedCheck(Check):
     """ Checks whether the version of the RDP is specified in semantic versioning format.
@@ -570,6 +707,7 @@ class VersionSpecifiedCheck(Check):
         Check.__init__(self)
         self.id = 24
         self.version = "0.0.1"
+        self.fields = ("metadata.version",)
 
     def _do_check(self, rdp):
         if rdp.metadata.version is None:
@@ -597,18 +735,12 @@ class LanguageSpecifiedCheck(Check):
         Check.__init__(self)
         self.id = 25
         self.version = "0.0.1"
-
-        iso_file_path = os.path.join(
-            os.path.dirname(os.path.abspath(__file__)),
-            'resources',
-            'iso-639.json'
-        )
-        self.iso_codes = pd.read_json(iso_file_path)
+        self.fields = ("metadata.language",)
 
     def _do_check(self, rdp):
         if rdp.metadata.language is None:
             return BooleanResult(False, "no language specified", True)
-        if rdp.metadata.language in self.iso_codes.alpha2.tolist():
+        if rdp.metadata.language in reference.iso_639_1_codes():
             return BooleanResult(True, "", True)
         return BooleanResult(
             False,
@@ -631,6 +763,7 @@ class ContributorsOrcidCheck(Check):
         Check.__init__(self)
         self.id = 26
         self.version = "0.0.1"
+        self.fields = ("metadata.contributors",)
 
     def _do_check(self, rdp):
         valid = []
@@ -654,6 +787,7 @@ class ContributorsFamilyAndGivenNameCheck(Check):
         Check.__init__(self)
         self.id = 27
         self.version = "0.0.1"
+        self.fields = ("metadata.contributors",)
 
     def _do_check(self, rdp):
         valid = []
@@ -674,6 +808,7 @@ class ContributorsContainInstitutionsCheck(Check):
         Check.__init__(self)
         self.id = 28
         self.version = "0.0.1"
+        self.fields = ("metadata.contributors",)
 
     def _do_check(self, rdp):
         institutions = []
@@ -699,6 +834,7 @@ class ContributorsTypeCheck(Check):
         Check.__init__(self)
         self.id = 29
         self.version = "0.0.1"
+        self.fields = ("metadata.contributors",)
 
     def _do_check(self, rdp):
         types = []
@@ -719,6 +855,7 @@ class PublicationYearCheck(Check):
         Check.__init__(self)
         self.id = 31
         self.version = "0.0.1"
+        self.fields = ("metadata.publicationYear",)
 
     def _do_check(self, rdp):
         if rdp.metadata.publicationYear is None:
@@ -742,6 +879,7 @@ class DatesTypeCheck(Check):
         Check.__init__(self)
         self.id = 32
         self.version = "0.0.1"
+        self.fields = ("metadata.dates",)
 
     def _do_check(self, rdp):
         types = []
@@ -764,6 +902,7 @@ class DatesIssuedYearCheck(Check):
         Check.__init__(self)
         self.id = 33
         self.version = "0.0.1"
+        self.fields = ("metadata.dates",)
 
     def _do_check(self, rdp):
         for d in rdp.metadata.dates:
@@ -784,6 +923,7 @@ class DatesInformationCheck(Check):
         Check.__init__(self)
         self.id = 34
         self.version = "0.0.1"
+        self.fields = ("metadata.dates",)
 
     def _do_check(self, rdp):
         information = []
@@ -807,6 +947,7 @@ class RelatedResourceTypeCheck(Check):
         Check.__init__(self)
         self.id = 35
         self.version = "0.0.1"
+        self.fields = ("metadata.relatedResources",)
 
     def _do_check(self, rdp):
         relationTypes = []
@@ -830,6 +971,7 @@ class RelatedResourceMetadataCheck(Check):
         Check.__init__(self)
         self.id = 36
         self.version = "0.0.1"
+        self.fields = ("metadata.relatedResources",)
 
     def _do_check(self, rdp):
         linkedProperly = []
@@ -850,14 +992,37 @@ class DataSizeCheck(Check):
     -------
     _do_check(self, rdp)
         returns a ListResult of bools, indicating whether metadata are linked properly
+    _ado_check(self, rdp)
+        returns a MetricResult (asynchronously, the headers are retrieved in
+        the default executor)
 
     """
     def __init__(self):
         Check.__init__(self)
         self.id = 37
         self.version = "0.0.1"
+        self.fields = ("pid", "metadata.sizes")
+        self.network = True
+        self.timeout = 60
 
     def _do_check(self, rdp):
+        result = self._metadata_result(rdp)
+        if result is not None:
+            return result
+        return self._headers_result(rdp)
+
+    async def _ado_check(self, rdp):
+        result = self._metadata_result(rdp)
+        if result is not None:
+            return result
+        import asyncio
+        return await asyncio.get_running_loop().run_in_executor(
+            None,
+            self._headers_result,
+            rdp
+        )
+
+    def _metadata_result(self, rdp):
         factors = {
             "k": 2 ** 10,
             "m": 2 ** 20,
@@ -879,7 +1044,10 @@ class DataSizeCheck(Check):
                 size += int(m.group(1)) * factors.get(m.groups("")[1].lower(), 1)
         if size > 0:
             return MetricResult(size, "Used metadata", True)
+        return None
 
+    def _headers_result(self, rdp):
+        size = 0
         # Try headers
         try:
             for service_name in rdp.services:
@@ -894,6 +1062,91 @@ class DataSizeCheck(Check):
 
         return MetricResult(sys.float_info.min, "Could not determine size", False)
 
+def detect_languages(texts):
+    """ returns a dict mapping each of the given texts to its detected language
+        (None if the language cannot be detected), each distinct text is only
+        detected once and texts in language_cache are not detected again
+    """
+    cache = language_cache
+    languages = {}
+    # key -> language of the texts detected in this call
+    detected = {}
+    for text in texts:
+        if text in languages:
+            continue
+        key = text_key(text)
+        language = detected.get(key, _MISSING)
+        if language is _MISSING:
+            language = cache.get(key, _MISSING)
+        if language is _MISSING:
+            language, definitive = _detect_language(text)
+            if definitive:
+                detected[key] = language
+        languages[text] = language
+    if len(detected) > 0:
+        cache.put_many([
+            (key, language, language is None, None)
+            for key, language in detected.items()
+        ])
+    return languages
+
+def configure_language_cache(**kwargs):
+    """ Replaces language_cache by a cache with the given settings (see
+        Cache, e.g. a path shares detected languages between processes and
+        runs), the other settings are those of the default cache
+    """
+    global language_cache
+    kwargs.setdefault("maxsize", 100000)
+    kwargs.setdefault("negative_ttl", 86400)
+    kwargs.setdefault("namespace", "languages")
+    old = language_cache
+    language_cache = Cache(**kwargs)
+    old.close()
+
+def text_key(text):
+    """ returns the key of a text in language_cache: a hash of the text with
+        whitespace normalized
+    """
+    return sha256(" ".join(text.split()).encode("utf-8")).hexdigest()
+
+def _detect_language(text):
+    """ returns the detected language of a text (None if it cannot be
+        detected) and whether the answer is definitive, i.e. not caused by
+        an error of langdetect
+    """
+    detect, LangDetectException, cant_detect = _langdetect()
+    try:
+        return detect(text), True
+    except LangDetectException as e:
+        return None, e.code == cant_detect
+
+def _langdetect():
+    """ returns langdetect's detect function, exception and the error code of
+        texts whose language cannot be detected. langdetect is imported,
+        seeded for deterministic results and its profiles are loaded once
+        on first use (langdetect publishes its factory before the profiles
+        are loaded, so threads must not initialize it concurrently).
+    """
+    global _langdetect_api
+    if _langdetect_api is None:
+        with _langdetect_lock:
+            if _langdetect_api is None:
+                from langdetect import detect, DetectorFactory
+                from langdetect.detector_factory import init_factory
+                from langdetect.lang_detect_exception import \
+                    ErrorCode, \
+                    LangDetectException
+                DetectorFactory.seed = 0
+                init_factory()
+                _langdetect_api = (detect, LangDetectException, ErrorCode.CantDetectError)
+    return _langdetect_api
+
+def matching_texts(pattern, texts):
+    """ returns the set of the given texts matched by the compiled pattern,
+        each distinct text is only matched once
+    """
+    return {text for text in set(texts) if pattern.match(text)}
+
 def is_valid_orcid(orcid):
     """ returns True when the given str is a valid orcid and the checksum test succeeds
     """
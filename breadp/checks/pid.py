@@ -8,10 +8,12 @@
 ################################################################################
 
 import re
-import requests
+import time
 
 from breadp.checks import Check
 from breadp.checks.result import BooleanResult
+from breadp.util import net
+from breadp.util.cache import Cache
 
 class IsValidDoiCheck(Check):
     """ Checks whether an RDP has a valid DOI as PID
@@ -25,6 +27,7 @@ class IsValidDoiCheck(Check):
         Check.__init__(self)
         self.id = 0
         self.version = "0.0.1"
+        self.fields = ("pid",)
 
     def _do_check(self, rdp):
         if not rdp.pid:
@@ -38,31 +41,131 @@ class IsValidDoiCheck(Check):
 class DoiResolvesCheck(Check):
     """ Checks whether the DOI of an RDP resolves
 
+    Attributes
+    ----------
+    resolver: str
+        Base URL of the DOI resolver
+    cache: Cache
+        Resolutions of DOIs as [status code, location, timestamp], fresh for
+        30 days (failed resolutions for a day)
+    index: DoiIndex
+        Local index of existing DOIs consulted before the resolver (None
+        always asks the resolver), DOIs missing in the index are resolved
+    verify: bool
+        Whether DOIs found in the index are resolved nevertheless
+
     Methods
     -------
     _do_check(self, rdp)
         returns a BooleanResult
+    _ado_check(self, rdp)
+        returns a BooleanResult (asynchronously)
+    _known_result(self, rdp)
+        returns a BooleanResult for RDPs without PID or with an indexed or
+        cached DOI, None if the resolver must be asked
+    preload(self, resolutions) -> None
+        Caches (DOI, status code, location, timestamp) tuples
     """
     def __init__(self):
         Check.__init__(self)
         self.id = 1
         self.version = "0.0.1"
+        self.fields = ("pid",)
+        self.network = True
+        self.timeout = 30
+        self.resolver = "https://doi.org/"
+        self.cache = Cache(maxsize=100000, ttl=30 * 24 * 3600, negative_ttl=24 * 3600)
+        self.index = None
+        self.verify = False
 
     def _do_check(self, rdp):
-        if not rdp.pid:
-            msg = "RDP has no PID"
-            return BooleanResult(False, msg, False)
+        # check and acheck ask _known_result first
+        try:
+            response = net.head(self.resolver + rdp.pid)
+        except Exception as e:
+            return self._exception_result(e)
+        return self._response_result(rdp, response)
+
+    async def _ado_check(self, rdp):
         try:
-            response = requests.head('https://doi.org/' + rdp.pid)
+            response = await net.ahead(self.resolver + rdp.pid)
         except Exception as e:
-            msg = "{}: {}".format(type(e).__name__, e)
+            return self._exception_result(e)
+        return self._response_result(rdp, response)
+
+    def preload(self, resolutions):
+        """ Caches resolutions, e.g. of an earlier run
+
+        Parameters
+        ----------
+        resolutions: iterable
+            (DOI, status code, location, timestamp) tuples, timestamp is the
+            time of the resolution in seconds since the epoch (None is now)
+        """
+        self.cache.put_many(
+            (doi.lower(), [status_code, location, timestamp], status_code != 302, timestamp)
+            for doi, status_code, location, timestamp in resolutions
+            if _is_definitive(status_code)
+        )
+
+    def _known_result(self, rdp):
+        """ returns the result for an RDP without a PID or with a PID found
+            in the index or the cache, None if the resolver must be asked
+        """
+        if not rdp.pid:
+            msg = "RDP has no PID"
             return BooleanResult(False, msg, False)
+        if self._indexed(rdp.pid):
+            return self._index_result(rdp)
+        resolution = self.cache.get(rdp.pid.lower())
+        if resolution is not None:
+            return self._resolution_result(rdp, resolution)
+        return None
+
+    def _response_result(self, rdp, response):
+        return self._resolution_result(rdp, self._remember(rdp.pid, response))
+
+    def _indexed(self, doi):
+        return self.index is not None and not self.verify and doi in self.index
+
+    def _index_result(self, rdp):
+        msg = "{} found in DOI index".format(rdp.pid)
+        return BooleanResult(True, msg, True)
+
+    def _exception_result(self, e):
+        msg = "{}: {}".format(type(e).__name__, e)
+        return BooleanResult(False, msg, False)
+
+    def _remember(self, doi, response):
+        # Errors without a response and transient answers (e.g. 429, 503)
+        # are not cached
+        resolution = [
+            response.status_code,
+            response.headers.get('Location'),
+            time.time()
+        ]
+        if not _is_definitive(response.status_code):
+            return resolution
+        self.cache.put(
+            doi.lower(),
+            resolution,
+            negative=response.status_code != 302,
+            timestamp=resolution[2]
+        )
+        return resolution
 
-        if response.status_code != 302:
+    def _resolution_result(self, rdp, resolution):
+        status_code, location, _ = resolution
+        if status_code != 302:
             msg = "Could not resolve {}, status code: {}".format(
-                rdp.pid, response.status_code)
+                rdp.pid, status_code)
             return BooleanResult(False, msg, True)
 
-        msg = "Location of resolved doi: {}".format(
-            response.headers.get('Location'))
+        msg = "Location of resolved doi: {}".format(location)
         return BooleanResult(True, msg, True)
+
+def _is_definitive(status_code):
+    """ returns whether a status code of the resolver is worth caching: a
+        (redirected) resolution or a DOI which does not exist
+    """
+    return 200 <= status_code < 400 or status_code in (404, 410)
@@ -17,6 +17,7 @@ class CheckResult(object):
     success: bool
         Flag indicating whether the check was successful
     """
+    __slots__ = ("msg", "success")
 
     def __init__(self, msg, success):
         self.msg = msg
@@ -31,6 +32,8 @@ class BooleanResult(CheckResult):
         Indicates whether the rdp fulfills the criterion checked
     """
 
+    __slots__ = ("outcome",)
+
     def __init__(self, outcome: bool, msg: str, success: bool):
         CheckResult.__init__(self, msg, success)
         self.outcome = outcome
@@ -43,6 +46,8 @@ class MetricResult(CheckResult):
     outcome: float
         The number the check resulted in (can be a float("nan")).
     """
+    __slots__ = ("outcome",)
+
     def __init__(self, outcome: float, msg: str, success: bool):
         CheckResult.__init__(self, msg, success)
         self.outcome = outcome
@@ -55,6 +60,8 @@ class ListResult(CheckResult):
     outcome: list
         The list the check resuled in.
     """
+    __slots__ = ("outcome",)
+
     def __init__(self, outcome: list, msg: str, success: bool):
         CheckResult.__init__(self, msg, success)
         self.outcome = outcome
@@ -67,6 +74,71 @@ class CardinalResult(CheckResult):
     outcome: list
         The list the check resuled in.
     """
+    __slots__ = ("outcome",)
+
     def __init__(self, outcome: str, msg: str, success: bool):
         CheckResult.__init__(self, msg, success)
         self.outcome = outcome
+
+class FailureResult(CheckResult):
+    """ A result of a check which could not be completed (e.g. because it
+        exceeded its time budget), success is always False
+
+    Attributes
+    ----------
+    outcome: None
+        There is no outcome
+    """
+    __slots__ = ("outcome",)
+
+    def __init__(self, msg: str):
+        CheckResult.__init__(self, msg, False)
+        self.outcome = None
+
+# Shared instances of the most common results
+_FLYWEIGHTS = {
+    (BooleanResult, True, True): BooleanResult(True, "", True),
+    (BooleanResult, False, True): BooleanResult(False, "", True),
+    (BooleanResult, True, False): BooleanResult(True, "", False),
+    (BooleanResult, False, False): BooleanResult(False, "", False),
+    (ListResult, True): ListResult([], "", True),
+    (ListResult, False): ListResult([], "", False),
+}
+
+def compact(result):
+    """ Returns a shared instance for common results (boolean outcomes and empty
+        lists without a message), otherwise the given result.
+        Shared results must not be modified.
+    """
+    if result.msg != "":
+        return result
+    rtype = type(result)
+    if rtype is BooleanResult and isinstance(result.outcome, bool):
+        return _FLYWEIGHTS[(rtype, result.outcome, bool(result.success))]
+    if rtype is ListResult and isinstance(result.outcome, list) and not result.outcome:
+        return _FLYWEIGHTS[(rtype, bool(result.success))]
+    return result
+
+def dump(result):
+    """ Returns a JSON serializable list [type name, outcome, msg, success]
+        of a result (see load)
+    """
+    return [
+        type(result).__name__,
+        getattr(result, "outcome", None),
+        result.msg,
+        bool(result.success)
+    ]
+
+def load(dumped):
+    """ Returns the result of a list returned by dump
+    """
+    rtype, outcome, msg, success = dumped
+    result_class = globals().get(rtype)
+    if not (isinstance(result_class, type) and issubclass(result_class, CheckResult)):
+        raise ValueError("{} is not a result type".format(rtype))
+    if result_class is CheckResult:
+        return CheckResult(msg, success)
+    if result_class is FailureResult:
+        return FailureResult(msg)
+    return result_class(outcome, msg, success)
@@ -61,6 +61,8 @@ class Evaluation(object):
     def evaluate(self, pid):
         """ Wrapper code around each evaluation
         Sets start and end time, handles state, and exceptions.
+        An unsuccessful check fixes the evaluation at 0, even if other checks
+        have not run.
 
         Parameters
         ----------
@@ -69,16 +71,18 @@ class Evaluation(object):
         """
         if len(self.checks) == 0:
             raise ValueError("No checks in {}".format(type(self).__name__))
-        for c in self.checks:
-            if c.get_last_result(pid) == None:
+        results = [c.get_last_result(pid) for c in self.checks]
+        for result in results:
+            if result is not None and not result.success:
+                return 0
+        for c, result in zip(self.checks, results):
+            if result is None:
                 raise ChecksNotRunException(
                     "{} has no result for {}".format(
                         type(c).__name__,
                         pid
                     )
                 )
-            if not c.log.get_by_pid(pid)[-1].result.success:
-                return 0
         return round(self._evaluate(pid)/len(self.checks), self.rounded)
 
     def _evaluate(self, pid):
@@ -12,6 +12,7 @@ import sys
 from rdp import Rdp
 
 from breadp.checks import Check
+from breadp.checks.result import FailureResult
 from breadp.evaluations import Evaluation
 from breadp.benchmarks import Benchmark
 
@@ -57,10 +58,7 @@ class Report(object):
 class CheckReport(Report):
     def __init__(self, pid: str, check: Check):
         Report.__init__(self, check.id, check.name, check.version, check.description)
-        try:
-            self.entry = check.log.get_by_pid(pid)[-1]
-        except IndexError:
-            self.entry = None
+        self.entry = check.log.get_last_by_pid(pid)
         self.type = check.type
 
     def todict(self) -> dict:
@@ -68,11 +66,46 @@ class CheckReport(Report):
         rv["type"] = self.type
         rv["start"] = self.entry.start
         rv["end"] = self.entry.end
+        rv["duration_ns"] = self.entry.duration_ns
         rv["success"] = self.entry.result.success
         rv["result"] = self.entry.result.outcome
+        rv["result_type"] = type(self.entry.result).__name__
         rv["msg"] = self.entry.result.msg
         return rv
 
+class LatencyReport(Report):
+    """ Latency percentiles of the runs of a check kept in its log
+    """
+    def __init__(self, check: Check):
+        Report.__init__(self, check.id, check.name, check.version, check.description)
+        entries = check.log.log
+        durations = sorted(le.duration_ns for le in entries)
+        self.count = len(durations)
+        self.p50_ns = percentile(durations, 50)
+        self.p99_ns = percentile(durations, 99)
+        self.max_ns = durations[-1] if durations else None
+        self.timeouts = sum(
+            1 for le in entries
+            if isinstance(le.result, FailureResult) and le.result.msg.startswith("Timeout")
+        )
+
+    def todict(self) -> dict:
+        rv = Report.todict(self)
+        rv["count"] = self.count
+        rv["p50_ns"] = self.p50_ns
+        rv["p99_ns"] = self.p99_ns
+        rv["max_ns"] = self.max_ns
+        rv["timeouts"] = self.timeouts
+        return rv
+
+def percentile(values, p):
+    """ returns the p-th percentile (nearest rank) of sorted values, None if
+        there are no values
+    """
+    if len(values) == 0:
+        return None
+    return values[max(0, -(-len(values) * p // 100) - 1)]
+
 class EvaluationReport(Report):
     def __init__(self, pid: str, ev: Evaluation):
         Report.__init__(self, ev.id, ev.name, ev.version, ev.description)
@@ -99,11 +132,19 @@ class BenchmarkReport(Report):
         self.precision = sys.float_info.mant_dig
         self.rounded = b.rounded
         self.evaluation_reports = []
+        self.skipped_evaluations = []
         for ev in b.evaluations:
-            if not b.skip(ev, rdp):
+            if b.skip(ev, rdp):
+                self.skipped_evaluations.append(ev.id)
+            else:
                 self.evaluation_reports.append(EvaluationReport(rdp.pid, ev))
+        # Checks which did not run for the RDP (e.g. because of planning)
+        self.skipped_checks = []
         self.check_reports = []
         for c in b.checks:
+            if c.log.get_last_by_pid(rdp.pid) is None:
+                self.skipped_checks.append(c.id)
+                continue
             self.check_reports.append(CheckReport(rdp.pid, c))
 
 
@@ -120,5 +161,7 @@ class BenchmarkReport(Report):
         rv["check_reports"] = []
         for chrp in self.check_reports:
             rv["check_reports"].append(chrp.todict())
+        rv["skipped_checks"] = self.skipped_checks
+        rv["skipped_evaluations"] = self.skipped_evaluations
         return rv
 
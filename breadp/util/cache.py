@@ -0,0 +1,230 @@
+################################################################################
+# Copyright: Tobias Weber 2020
+#
+# Apache 2.0 License
+#
+# This file contains all code related to caching results of lookups
+#
+################################################################################
+
+from collections import OrderedDict
+import json
+import os
+import sqlite3
+import threading
+import time
+
+_MISSING = object()
+
+class Cache(object):
+    """ LRU cache whose entries expire after a time to live (TTL), failures
+        (negative entries) may have a shorter TTL. With a path, entries are
+        also written to an SQLite database and survive the process. Expired
+        entries are deleted from the database when it is opened and after
+        every maxsize writes, which also delete the entries written longest
+        ago beyond maxsize (so the database holds at most 2 * maxsize
+        entries per namespace).
+
+    Attributes
+    ----------
+    maxsize: int
+        Maximum number of entries kept in memory (least recently used
+        entries are evicted first) and in the database after it is purged
+    ttl: float
+        Seconds after which an entry expires (None never expires)
+    negative_ttl: float
+        Seconds after which a negative entry expires (defaults to ttl)
+    path: str
+        Path of the SQLite database entries are persisted in (None keeps
+        entries in memory only)
+    namespace: str
+        Name separating the entries of several caches in one database
+    hits: int
+        Number of lookups answered from the cache
+    misses: int
+        Number of lookups not answered from the cache
+    evictions: int
+        Number of entries evicted from memory because of maxsize
+
+    Methods
+    -------
+    get(self, key, default=None) -> object
+        Returns the value cached for key or default
+    put(self, key, value, negative=False, timestamp=None, ttl=None) -> None
+        Caches value (must be JSON serializable if persisted) for key
+    put_many(self, entries) -> None
+        Caches (key, value, negative, timestamp) tuples in one transaction
+    stats(self) -> dict
+        Returns the counters, the number of entries in memory and the hit
+        rate (None before the first lookup)
+    clear(self) -> None
+        Removes all entries (and resets the counters)
+    close(self) -> None
+        Closes the database
+    """
+    def __init__(self, maxsize=1024, ttl=None, negative_ttl=None, path=None,
+                 namespace="default"):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1, got {}".format(maxsize))
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = ttl if negative_ttl is None else negative_ttl
+        self.path = path
+        self.namespace = namespace
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # key -> (value, expiry as time.time() or None)
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+        self._connection = None
+        self._writes = 0
+        if path is not None:
+            self._connect()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def _db(self):
+        # The connection must not be used after a fork, forked processes
+        # open their own
+        if self._connection is not None and self._pid != os.getpid():
+            self._connect()
+        return self._connection
+
+    def __contains__(self, key):
+        with self._lock:
+            return self._lookup(key) is not _MISSING
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._lookup(key)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return value
+
+    def put(self, key, value, negative=False, timestamp=None, ttl=None):
+        """ Caches value for key, the entry expires ttl (defaults to ttl or
+            negative_ttl of the cache) seconds after timestamp (defaults to
+            now)
+        """
+        self._store([(key, value, self._expires(negative, timestamp, ttl))])
+
+    def put_many(self, entries):
+        self._store([
+            (key, value, self._expires(negative, timestamp))
+            for key, value, negative, timestamp in entries
+        ])
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups > 0 else None
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+            if self._db is not None:
+                self._db.execute(
+                    "DELETE FROM cache WHERE namespace = ?",
+                    (self.namespace,)
+                )
+                self._db.commit()
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._connection = None
+
+    def _connect(self):
+        self._pid = os.getpid()
+        self._connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "namespace TEXT, key TEXT, value TEXT, expires REAL, "
+            "PRIMARY KEY (namespace, key))"
+        )
+        self._connection.commit()
+        self._purge()
+
+    def _purge(self):
+        """ Deletes the expired entries of the namespace from the database
+            and the entries written longest ago beyond maxsize (a replaced
+            entry gets a new rowid)
+        """
+        self._writes = 0
+        self._connection.execute(
+            "DELETE FROM cache WHERE namespace = ? AND expires <= ?",
+            (self.namespace, time.time())
+        )
+        self._connection.execute(
+            "DELETE FROM cache WHERE namespace = ? AND rowid NOT IN ("
+            "SELECT rowid FROM cache WHERE namespace = ? "
+            "ORDER BY rowid DESC LIMIT ?)",
+            (self.namespace, self.namespace, self.maxsize)
+        )
+        self._connection.commit()
+
+    def _expires(self, negative, timestamp, ttl=None):
+        if ttl is None:
+            ttl = self.negative_ttl if negative else self.ttl
+        if ttl is None:
+            return None
+        return (time.time() if timestamp is None else timestamp) + ttl
+
+    def _store(self, entries):
+        with self._lock:
+            for key, value, expires in entries:
+                self._remember(key, value, expires)
+            if self._db is not None:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)",
+                    [
+                        (self.namespace, key, json.dumps(value), expires)
+                        for key, value, expires in entries
+                    ]
+                )
+                self._db.commit()
+                self._writes += len(entries)
+                if self._writes >= self.maxsize:
+                    self._purge()
+
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is None and self._db is not None:
+            row = self._db.execute(
+                "SELECT value, expires FROM cache WHERE namespace = ? AND key = ?",
+                (self.namespace, key)
+            ).fetchone()
+            if row is not None:
+                entry = (json.loads(row[0]), row[1])
+                self._remember(key, *entry)
+        if entry is None:
+            return _MISSING
+        value, expires = entry
+        if expires is not None and expires <= time.time():
+            del self._entries[key]
+            return _MISSING
+        self._entries.move_to_end(key)
+        return value
+
+    def _remember(self, key, value, expires):
+        self._entries[key] = (value, expires)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
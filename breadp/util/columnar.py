@@ -0,0 +1,192 @@
+################################################################################
+# Copyright: Tobias Weber 2020
+#
+# Apache 2.0 License
+#
+# This file contains all code related to column-oriented log objects
+#
+################################################################################
+
+from array import array
+import threading
+
+from breadp.checks.result import \
+    BooleanResult, \
+    CardinalResult, \
+    ListResult, \
+    MetricResult, \
+    compact
+from breadp.util.log import CheckLogEntry
+
+# Kinds of outcome columns
+_OBJECT = 0
+_BOOLEAN = 1
+_METRIC_INT = 2
+_METRIC_FLOAT = 3
+_CARDINAL = 4
+_LIST = 5
+
+_INT64_MIN = -2 ** 63
+_INT64_MAX = 2 ** 63 - 1
+
+class ColumnarLog(object):
+    """ Log of check log entries which stores the entries column by column.
+
+        PIDs and messages are interned, timestamps are stored as int64
+        nanoseconds since the epoch, success flags in a bitmask and the
+        outcomes of BooleanResult, MetricResult, CardinalResult and ListResult
+        in typed columns (lists are stored offset-encoded in one flat column).
+        Results of other types are kept as objects. CheckLogEntry and
+        CheckResult objects are only materialized on access.
+
+        Note: Retention policies are not supported by this log.
+        All methods are safe to be called from several threads.
+
+    Methods
+    -------
+    add(self, le) -> None
+        Adds a check log entry
+    get_by_pid(self, pid) -> list
+        Returns all log entries for the given PID (in insertion order)
+    get_last_by_pid(self, pid) -> CheckLogEntry
+        Returns the last log entry for the given PID (None if there is none)
+    """
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._strings = []
+        self._string_ids = {}
+        self._pid_col = array('i')
+        self._start_col = array('q')
+        self._end_col = array('q')
+        self._success_bits = bytearray()
+        self._msg_col = array('i')
+        self._kind_col = array('b')
+        self._slot_col = array('q')
+        self._booleans = bytearray()
+        self._metric_ints = array('q')
+        self._metric_floats = array('d')
+        self._cardinals = array('i')
+        self._list_offsets = array('q', [0])
+        self._list_values = []
+        self._objects = []
+        self._index = {}
+
+    def __len__(self):
+        with self._lock:
+            return len(self._pid_col)
+
+    @property
+    def log(self):
+        with self._lock:
+            return [self._entry(row) for row in range(len(self))]
+
+    @property
+    def retention(self):
+        return []
+
+    @retention.setter
+    def retention(self, retention):
+        if retention:
+            raise ValueError("ColumnarLog does not support retention policies")
+
+    def pin(self, pid):
+        pass
+
+    def unpin(self, pid):
+        pass
+
+    def add(self, le):
+        with self._lock:
+            row = len(self._pid_col)
+            pid_id = self._intern(le.pid)
+            self._pid_col.append(pid_id)
+            self._start_col.append(le.start_ns)
+            self._end_col.append(le.end_ns)
+            if row % 8 == 0:
+                self._success_bits.append(0)
+            if le.result.success:
+                self._success_bits[row >> 3] |= 1 << (row & 7)
+            self._msg_col.append(self._intern(le.result.msg))
+            kind, slot = self._store_outcome(le.result)
+            self._kind_col.append(kind)
+            self._slot_col.append(slot)
+            rows = self._index.get(pid_id)
+            if rows is None:
+                self._index[pid_id] = array('q', (row,))
+            else:
+                rows.append(row)
+
+    def get_by_pid(self, pid):
+        with self._lock:
+            rows = self._index.get(self._string_ids.get(pid))
+            if rows is None:
+                return []
+            return [self._entry(row) for row in rows]
+
+    def get_last_by_pid(self, pid):
+        with self._lock:
+            rows = self._index.get(self._string_ids.get(pid))
+            if rows is None:
+                return None
+            return self._entry(rows[-1])
+
+    def _intern(self, s):
+        sid = self._string_ids.get(s)
+        if sid is None:
+            sid = len(self._strings)
+            self._strings.append(s)
+            self._string_ids[s] = sid
+        return sid
+
+    def _store_outcome(self, result):
+        rtype = type(result)
+        outcome = getattr(result, "outcome", None)
+        if rtype is BooleanResult and isinstance(outcome, bool):
+            self._booleans.append(outcome)
+            return _BOOLEAN, len(self._booleans) - 1
+        if rtype is MetricResult:
+            if isinstance(outcome, int) and not isinstance(outcome, bool) \
+                    and _INT64_MIN <= outcome <= _INT64_MAX:
+                self._metric_ints.append(outcome)
+                return _METRIC_INT, len(self._metric_ints) - 1
+            if isinstance(outcome, float):
+                self._metric_floats.append(outcome)
+                return _METRIC_FLOAT, len(self._metric_floats) - 1
+        if rtype is CardinalResult and isinstance(outcome, str):
+            self._cardinals.append(self._intern(outcome))
+            return _CARDINAL, len(self._cardinals) - 1
+        if rtype is ListResult and isinstance(outcome, list):
+            self._list_values.extend(outcome)
+            self._list_offsets.append(len(self._list_values))
+            return _LIST, len(self._list_offsets) - 2
+        self._objects.append(result)
+        return _OBJECT, len(self._objects) - 1
+
+    def _entry(self, row):
+        return CheckLogEntry(
+            self._start_col[row],
+            self._end_col[row],
+            self._strings[self._pid_col[row]],
+            self._result(row)
+        )
+
+    def _result(self, row):
+        kind = self._kind_col[row]
+        slot = self._slot_col[row]
+        if kind == _OBJECT:
+            return self._objects[slot]
+        msg = self._strings[self._msg_col[row]]
+        success = bool(self._success_bits[row >> 3] & (1 << (row & 7)))
+        if kind == _BOOLEAN:
+            return compact(BooleanResult(bool(self._booleans[slot]), msg, success))
+        if kind == _METRIC_INT:
+            return MetricResult(self._metric_ints[slot], msg, success)
+        if kind == _METRIC_FLOAT:
+            return MetricResult(self._metric_floats[slot], msg, success)
+        if kind == _CARDINAL:
+            return CardinalResult(self._strings[self._cardinals[slot]], msg, success)
+        return compact(ListResult(
+            self._list_values[self._list_offsets[slot]:self._list_offsets[slot + 1]],
+            msg,
+            success
+        ))
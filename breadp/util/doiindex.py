@@ -0,0 +1,165 @@
+################################################################################
+# Copyright: Tobias Weber 2020
+#
+# Apache 2.0 License
+#
+# This file contains all code related to the offline DOI index
+#
+# Build an index from a dump with one DOI per line (optionally gzipped):
+#     python -m breadp.util.doiindex dois.txt.gz dois.idx
+#
+################################################################################
+
+import argparse
+import gzip
+from hashlib import blake2b
+import math
+import mmap
+import struct
+
+_MAGIC = b"BREADPDOI1\n"
+# number of DOIs, number of bloom filter bits, number of hash functions
+_HEADER = struct.Struct("<QQQ")
+_OFFSET = struct.Struct("<Q")
+_PREFIXES = ("https://doi.org/", "http://doi.org/", "https://dx.doi.org/",
+             "http://dx.doi.org/", "doi:")
+
+class DoiIndex(object):
+    """ Read-only set of DOIs memory-mapped from an index file: a Bloom filter
+        rejects most unknown DOIs, an exact sorted list of the DOIs is binary
+        searched otherwise. DOIs are compared case-insensitively.
+
+    Attributes
+    ----------
+    path: str
+        Path of the index file (see build)
+
+    Methods
+    -------
+    close(self) -> None
+        Unmaps the index file
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:len(_MAGIC)] != _MAGIC:
+            self._mm.close()
+            raise ValueError("{} is not a DOI index".format(path))
+        self._n, self._bits, self._hashes = _HEADER.unpack_from(self._mm, len(_MAGIC))
+        self._bloom = len(_MAGIC) + _HEADER.size
+        self._offsets = self._bloom + (self._bits + 7) // 8
+        self._data = self._offsets + (self._n + 1) * _OFFSET.size
+
+    def __len__(self):
+        return self._n
+
+    def __contains__(self, doi):
+        key = normalize(doi).encode("utf-8")
+        mm = self._mm
+        for position in _positions(key, self._bits, self._hashes):
+            if not mm[self._bloom + position // 8] & (1 << (position % 8)):
+                return False
+        lo, hi = 0, self._n
+        while lo < hi:
+            mid = (lo + hi) // 2
+            candidate = self._doi(mid)
+            if candidate < key:
+                lo = mid + 1
+            elif candidate > key:
+                hi = mid
+            else:
+                return True
+        return False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self._mm.close()
+
+    def _doi(self, i):
+        start, = _OFFSET.unpack_from(self._mm, self._offsets + i * _OFFSET.size)
+        end, = _OFFSET.unpack_from(self._mm, self._offsets + (i + 1) * _OFFSET.size)
+        return self._mm[self._data + start:self._data + end]
+
+def normalize(doi):
+    """ returns the DOI in lower case without resolver or doi: prefix
+    """
+    doi = doi.strip()
+    lower = doi.lower()
+    for prefix in _PREFIXES:
+        if lower.startswith(prefix):
+            return lower[len(prefix):]
+    return lower
+
+def build(dois, path, false_positive_rate=0.01):
+    """ Writes an index of the given DOIs to path and returns the number of
+        distinct DOIs (all DOIs are sorted in memory)
+
+    Parameters
+    ----------
+    dois: iterable
+        DOIs (str)
+    path: str
+        Path of the index file
+    false_positive_rate: float
+        False positive rate of the Bloom filter
+    """
+    keys = sorted({normalize(doi).encode("utf-8") for doi in dois} - {b""})
+    n = len(keys)
+    bits = max(8, math.ceil(-max(n, 1) * math.log(false_positive_rate) / math.log(2) ** 2))
+    hashes = max(1, round(bits / max(n, 1) * math.log(2)))
+    bloom = bytearray((bits + 7) // 8)
+    for key in keys:
+        for position in _positions(key, bits, hashes):
+            bloom[position // 8] |= 1 << (position % 8)
+    with open(path, "wb") as f:
+        f.write(_MAGIC)
+        f.write(_HEADER.pack(n, bits, hashes))
+        f.write(bloom)
+        offset = 0
+        f.write(_OFFSET.pack(offset))
+        for key in keys:
+            offset += len(key)
+            f.write(_OFFSET.pack(offset))
+        for key in keys:
+            f.write(key)
+    return n
+
+def read_dump(path):
+    """ yields the DOIs of a dump file with one DOI per line (gzipped if the
+        path ends with .gz)
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield line
+
+def _positions(key, bits, hashes):
+    digest = blake2b(key, digest_size=16).digest()
+    h1 = int.from_bytes(digest[:8], "little")
+    h2 = int.from_bytes(digest[8:], "little") | 1
+    for i in range(hashes):
+        yield (h1 + i * h2) % bits
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Builds a DOI index from a dump with one DOI per line"
+    )
+    parser.add_argument("dump", help="dump file (optionally gzipped)")
+    parser.add_argument("index", help="index file to write")
+    parser.add_argument(
+        "--false-positive-rate",
+        type=float,
+        default=0.01,
+        help="false positive rate of the Bloom filter (default: 0.01)"
+    )
+    args = parser.parse_args()
+    n = build(read_dump(args.dump), args.index, args.false_positive_rate)
+    print("Indexed {} DOIs in {}".format(n, args.index))
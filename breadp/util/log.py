@@ -7,30 +7,373 @@
 #
 ################################################################################
 
+from datetime import datetime, timedelta
+import sys
+import threading
+import time
+
+_EPOCH = datetime(1970, 1, 1)
+
 class Log(object):
-    def __init__(self):
-        self.log = []
+    """ Log of entries, indexed by the PID of the RDP the entries belong to
+
+    Attributes
+    ----------
+    log: list
+        All retained log entries in the order they were added
+    retention: list
+        Retention policies applied whenever an entry is added
+    nbytes: int
+        Estimated size of all retained log entries in bytes
+
+    Methods
+    -------
+    add(self, le) -> None
+        Adds a log entry (and evicts entries according to the retention policies)
+    get_by_pid(self, pid) -> list
+        Returns all log entries for the given PID (in insertion order)
+    get_last_by_pid(self, pid) -> LogEntry
+        Returns the last log entry for the given PID (None if there is none)
+    pin(self, pid) -> None
+        Protects the last entry of a PID from eviction until unpin is called
+    unpin(self, pid) -> None
+        Releases the protection set by pin
+
+    All methods are safe to be called from several threads. The time an
+    entry was added and its estimated size are only recorded while a
+    retention policy needs them (see RetentionPolicy).
+    """
+    def __init__(self, retention=None):
+        self._lock = threading.RLock()
+        # sequence number -> entry, sequence numbers increase with each add
+        self._entries = {}
+        # smallest sequence number which may still be retained
+        self._first = 1
+        # pid -> sequence number of its only entry or list of sequence numbers
+        self._index = {}
+        # sequence number -> monotonic time added / estimated size (None if
+        # no retention policy needs them)
+        self._times = None
+        self._sizes = None
+        self._nbytes = 0
+        self._pinned = {}
+        self._held = {}
+        self._seq = 0
+        self.retention = retention
 
     def __len__(self):
-        return len(self.log)
+        return len(self._entries)
+
+    @property
+    def log(self):
+        with self._lock:
+            return list(self._entries.values())
+
+    @property
+    def nbytes(self):
+        with self._lock:
+            if self._sizes is None:
+                return sum(estimate_size(le) for le in self._entries.values())
+            return self._nbytes
+
+    @property
+    def retention(self):
+        return self._retention
+
+    @retention.setter
+    def retention(self, retention):
+        if retention is None:
+            retention = []
+        elif isinstance(retention, RetentionPolicy):
+            retention = [retention]
+        retention = list(retention)
+        with self._lock:
+            if any(p.needs_time for p in retention):
+                if self._times is None:
+                    # entries added before count as added now
+                    now = time.monotonic()
+                    self._times = {seq: now for seq in self._entries}
+            else:
+                self._times = None
+            if any(p.needs_size for p in retention):
+                if self._sizes is None:
+                    self._sizes = {
+                        seq: estimate_size(le) for seq, le in self._entries.items()
+                    }
+                    self._nbytes = sum(self._sizes.values())
+            else:
+                self._sizes = None
+                self._nbytes = 0
+            self._retention = retention
 
     def add(self, le):
-        self.log.append(le)
+        sized = self._sizes is not None
+        if sized:
+            size = estimate_size(le)
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+            self._entries[seq] = le
+            if self._times is not None:
+                self._times[seq] = time.monotonic()
+            if self._sizes is not None:
+                if not sized:
+                    size = estimate_size(le)
+                self._sizes[seq] = size
+                self._nbytes += size
+            if self._held:
+                self._held.pop(le.pid, None)
+            seqs = self._index.get(le.pid)
+            if seqs is None:
+                self._index[le.pid] = seq
+            elif type(seqs) is int:
+                self._index[le.pid] = [seqs, seq]
+            else:
+                seqs.append(seq)
+            for policy in self._retention:
+                policy.enforce(self, le)
 
     def get_by_pid(self, pid):
-        rv = []
-        for le in self.log:
-            if le.pid == pid:
-                rv.append(le)
-        return rv
+        with self._lock:
+            seqs = self._index.get(pid)
+            if seqs is not None:
+                if type(seqs) is int:
+                    return [self._entries[seqs]]
+                return [self._entries[s] for s in seqs]
+            if pid in self._held:
+                return [self._held[pid]]
+            return []
+
+    def get_last_by_pid(self, pid):
+        with self._lock:
+            seqs = self._index.get(pid)
+            if seqs is not None:
+                return self._entries[seqs if type(seqs) is int else seqs[-1]]
+            return self._held.get(pid)
+
+    def pin(self, pid):
+        with self._lock:
+            self._pinned[pid] = self._pinned.get(pid, 0) + 1
+
+    def unpin(self, pid):
+        with self._lock:
+            count = self._pinned.get(pid, 0) - 1
+            if count > 0:
+                self._pinned[pid] = count
+                return
+            self._pinned.pop(pid, None)
+            self._held.pop(pid, None)
+
+    def oldest(self):
+        """ Returns a tuple (entry, monotonic time added, estimated size)
+            of the oldest retained entry (None if the log is empty). Time
+            and size are None unless a retention policy needs them.
+        """
+        with self._lock:
+            seq = self._oldest_seq()
+            if seq is None:
+                return None
+            return (
+                self._entries[seq],
+                None if self._times is None else self._times[seq],
+                None if self._sizes is None else self._sizes[seq]
+            )
+
+    def evict_oldest(self):
+        with self._lock:
+            seq = self._oldest_seq()
+            if seq is not None:
+                self._evict(seq)
+
+    def evict_older(self, pid):
+        """ Evicts all but the last entry of the given pid
+        """
+        with self._lock:
+            seqs = self._index.get(pid)
+            while seqs is not None and type(seqs) is not int:
+                self._evict(seqs[0])
+                seqs = self._index.get(pid)
+
+    def _oldest_seq(self):
+        if not self._entries:
+            return None
+        # Entries are evicted oldest first per pid, but not globally, so
+        # the cursor skips the evicted ones (each number once)
+        while self._first not in self._entries:
+            self._first += 1
+        return self._first
+
+    def _evict(self, seq):
+        # seq is the oldest entry of its pid
+        le = self._entries.pop(seq)
+        if self._times is not None:
+            del self._times[seq]
+        if self._sizes is not None:
+            self._nbytes -= self._sizes.pop(seq)
+        seqs = self._index[le.pid]
+        if type(seqs) is int:
+            del self._index[le.pid]
+            # The last entry of a pinned pid stays available for lookups
+            if le.pid in self._pinned:
+                self._held[le.pid] = le
+        else:
+            del seqs[0]
+            if len(seqs) == 1:
+                self._index[le.pid] = seqs[0]
+
+class RetentionPolicy(object):
+    """ Base class and interface for retention policies of logs
+
+    Attributes
+    ----------
+    needs_time: bool
+        Whether the policy needs the time each entry was added
+    needs_size: bool
+        Whether the policy needs the estimated size of each entry
+
+    Methods
+    -------
+    enforce(self, log, le) -> None
+        Evicts entries from the log after le was added
+    """
+    needs_time = False
+    needs_size = False
+
+    def enforce(self, log, le):
+        raise NotImplementedError("enforce must be implemented by subclasses of RetentionPolicy")
+
+class KeepLastPerPidPolicy(RetentionPolicy):
+    """ Keeps only the last entry for each PID
+    """
+    def enforce(self, log, le):
+        log.evict_older(le.pid)
+
+class KeepLastNPolicy(RetentionPolicy):
+    """ Keeps only the last n entries of the log
+
+    Attributes
+    ----------
+    n: int
+        Number of entries to keep (at least 1)
+    """
+    def __init__(self, n):
+        if n < 1:
+            raise ValueError("n must be at least 1, not {}".format(n))
+        self.n = n
+
+    def enforce(self, log, le):
+        while len(log) > self.n:
+            log.evict_oldest()
+
+class MaxAgePolicy(RetentionPolicy):
+    """ Drops entries which were added more than max_age seconds ago
+
+    Attributes
+    ----------
+    max_age: float
+        Maximum age of an entry in seconds
+    """
+    needs_time = True
+
+    def __init__(self, max_age):
+        self.max_age = max_age
+
+    def enforce(self, log, le):
+        now = time.monotonic()
+        oldest = log.oldest()
+        while oldest is not None and now - oldest[1] > self.max_age:
+            log.evict_oldest()
+            oldest = log.oldest()
+
+class MaxBytesPolicy(RetentionPolicy):
+    """ Drops the oldest entries while the estimated size of the log exceeds
+        max_bytes (the entry added last is always kept).
+
+    Attributes
+    ----------
+    max_bytes: int
+        Maximum estimated size of the log in bytes
+    """
+    needs_size = True
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+
+    def enforce(self, log, le):
+        while log.nbytes > self.max_bytes and len(log) > 1:
+            log.evict_oldest()
 
 class LogEntry(object):
-    def __init__(self, start, end, pid):
-        self.start = start
-        self.end = end
+    """ Base class for log entries
+
+    Attributes
+    ----------
+    start_ns: int
+        Time (UTC) the logged action started in nanoseconds since the epoch
+    end_ns: int
+        Time (UTC) the logged action ended in nanoseconds since the epoch
+    pid: str
+        PID of the RDP the entry belongs to
+    start: str
+        start_ns in ISO 8601 format
+    end: str
+        end_ns in ISO 8601 format
+    duration_ns: int
+        Duration of the logged action in nanoseconds
+    """
+    __slots__ = ("start_ns", "end_ns", "pid")
+
+    def __init__(self, start_ns, end_ns, pid):
+        self.start_ns = start_ns
+        self.end_ns = end_ns
         self.pid = pid
 
+    @property
+    def start(self):
+        return isoformat(self.start_ns)
+
+    @property
+    def end(self):
+        return isoformat(self.end_ns)
+
+    @property
+    def duration_ns(self):
+        return self.end_ns - self.start_ns
+
 class CheckLogEntry(LogEntry):
-    def __init__(self, start, end, pid, result):
-        LogEntry.__init__(self, start, end, pid)
+    __slots__ = ("result",)
+
+    def __init__(self, start_ns, end_ns, pid, result):
+        LogEntry.__init__(self, start_ns, end_ns, pid)
         self.result = result
+
+def isoformat(ns):
+    """ Returns the given nanoseconds since the epoch as ISO 8601 string (UTC)
+    """
+    return (_EPOCH + timedelta(microseconds=ns // 1000)).isoformat()
+
+def nanoseconds(iso):
+    """ Returns the nanoseconds since the epoch of an ISO 8601 string returned
+        by isoformat (with microsecond precision)
+    """
+    return (datetime.fromisoformat(iso) - _EPOCH) // timedelta(microseconds=1) * 1000
+
+def estimate_size(le):
+    """ Returns a rough estimate of the memory (in bytes) held by a log entry
+    """
+    size = _sizeof(le) + _sizeof(le.start_ns) + _sizeof(le.end_ns) + _sizeof(le.pid)
+    result = getattr(le, "result", None)
+    if result is not None:
+        size += _sizeof(result) + _sizeof(result.msg)
+        outcome = getattr(result, "outcome", None)
+        size += _sizeof(outcome)
+        if isinstance(outcome, (list, tuple)):
+            for item in outcome:
+                size += _sizeof(item)
+    return size
+
+def _sizeof(obj):
+    size = sys.getsizeof(obj)
+    if hasattr(obj, "__dict__"):
+        size += sys.getsizeof(obj.__dict__)
+    return size
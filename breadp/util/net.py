@@ -0,0 +1,586 @@
+################################################################################
+# Copyright: Tobias Weber 2020
+#
+# Apache 2.0 License
+#
+# This file contains all code related to HTTP requests of checks
+#
+################################################################################
+
+import os
+import threading
+import time
+from urllib.parse import quote, urlsplit
+
+from breadp import CircuitOpenException
+
+THROTTLING_STATUS_CODES = (429, 503)
+
+class HostLimiter(object):
+    """ Limits requests to one host by a token bucket and a concurrency
+        limit, both adapted AIMD-style: each throttled response (429/503)
+        multiplies them by backoff, each other response increases them
+        additively up to their maximum
+
+    Attributes
+    ----------
+    max_rate: float
+        Maximum requests per second (None does not limit the rate)
+    rate: float
+        Current requests per second
+    min_rate: float
+        Rate the backoff does not go below
+    burst: int
+        Maximum number of requests sent at once at the current rate
+    max_concurrency: int
+        Maximum number of requests in flight
+    concurrency: float
+        Current limit of requests in flight
+    backoff: float
+        Factor applied to rate and concurrency on a throttled response
+    requests: int
+        Number of requests sent
+    throttled: int
+        Number of throttled responses
+    waited: float
+        Seconds spent waiting for the limits
+
+    Methods
+    -------
+    acquire(self) -> None
+        Blocks until a request may be sent
+    aacquire(self) -> None
+        Waits in the running event loop until a request may be sent
+    release(self, status_code) -> None
+        Records the response (None if there was none) of a request
+    stats(self) -> dict
+        Returns the counters and current limits
+    """
+    def __init__(self, rate=None, burst=10, concurrency=8, backoff=0.5,
+                 min_rate=1.0):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min_rate
+        self.burst = burst
+        self.max_concurrency = concurrency
+        self.concurrency = float(concurrency)
+        self.backoff = backoff
+        self.requests = 0
+        self.throttled = 0
+        self.waited = 0.0
+        self._active = 0
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        start = time.monotonic()
+        with self._condition:
+            wait = self._try_acquire()
+            while wait > 0:
+                self._condition.wait(wait)
+                wait = self._try_acquire()
+            self.waited += time.monotonic() - start
+
+    async def aacquire(self):
+        import asyncio
+        start = time.monotonic()
+        while True:
+            with self._condition:
+                wait = self._try_acquire()
+                if wait == 0:
+                    self.waited += time.monotonic() - start
+                    return
+            await asyncio.sleep(wait)
+
+    def release(self, status_code):
+        with self._condition:
+            self._active -= 1
+            if status_code in THROTTLING_STATUS_CODES:
+                self.throttled += 1
+                self.concurrency = max(1.0, self.concurrency * self.backoff)
+                if self.rate is not None:
+                    self.rate = max(self.min_rate, self.rate * self.backoff)
+            elif status_code is not None:
+                self.concurrency = min(
+                    self.max_concurrency,
+                    self.concurrency + 1 / self.concurrency
+                )
+                if self.rate is not None:
+                    self.rate = min(self.max_rate, self.rate + self.min_rate)
+            self._condition.notify()
+
+    def stats(self):
+        with self._condition:
+            return {
+                "requests": self.requests,
+                "throttled": self.throttled,
+                "waited": self.waited,
+                "rate": self.rate,
+                "concurrency": int(self.concurrency)
+            }
+
+    def _try_acquire(self):
+        """ Takes a token and a concurrency slot and returns 0, or returns
+            the seconds to wait before trying again
+        """
+        if self._active >= int(self.concurrency):
+            # release notifies waiting threads
+            return 0.05
+        if self.rate is not None:
+            now = time.monotonic()
+            self._tokens = min(
+                self.burst,
+                self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            if self._tokens < 1:
+                return (1 - self._tokens) / self.rate
+            self._tokens -= 1
+        self._active += 1
+        self.requests += 1
+        return 0
+
+class CircuitBreaker(object):
+    """ Circuit breaker of requests to one host. While closed, requests
+        pass; failure_threshold consecutive failures (errors or status codes
+        from 500) open the circuit. While open, requests are rejected; after
+        reset_timeout seconds the circuit is half-open and lets one trial
+        request pass, which closes the circuit on success and opens it again
+        on failure.
+
+    Attributes
+    ----------
+    failure_threshold: int
+        Number of consecutive failures opening the circuit
+    reset_timeout: float
+        Seconds until an open circuit lets a trial request pass
+    state: str
+        "closed", "open" or "half-open"
+    failures: int
+        Number of consecutive failures
+    opened: int
+        Number of times the circuit opened
+    rejected: int
+        Number of requests rejected
+
+    Methods
+    -------
+    allow(self) -> bool
+        Returns whether a request may be sent now
+    record(self, success) -> None
+        Records the outcome of an allowed request (None if unknown, e.g. a
+        cancelled request)
+    stats(self) -> dict
+        Returns the state and counters
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CircuitBreaker.CLOSED
+        self.failures = 0
+        self.opened = 0
+        self.rejected = 0
+        self._opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == CircuitBreaker.OPEN and \
+                    time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = CircuitBreaker.HALF_OPEN
+            if self.state == CircuitBreaker.CLOSED:
+                return True
+            if self.state == CircuitBreaker.HALF_OPEN and not self._trial:
+                self._trial = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record(self, success):
+        with self._lock:
+            trial = self._trial and self.state == CircuitBreaker.HALF_OPEN
+            if trial:
+                self._trial = False
+            if success is None:
+                return
+            if success:
+                self.failures = 0
+                if trial:
+                    self.state = CircuitBreaker.CLOSED
+                return
+            self.failures += 1
+            if trial or (self.state == CircuitBreaker.CLOSED and
+                         self.failures >= self.failure_threshold):
+                self.state = CircuitBreaker.OPEN
+                self.opened += 1
+                self._opened_at = time.monotonic()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "failures": self.failures,
+                "opened": self.opened,
+                "rejected": self.rejected
+            }
+
+class HttpClient(object):
+    """ Shared HTTP client of checks, keeping a pool of keep-alive
+        connections per host (one requests.Session per process), limiting
+        the requests per host (see HostLimiter) and failing fast while a
+        host is down (see CircuitBreaker)
+
+    Attributes
+    ----------
+    pool_connections: int
+        Number of hosts whose connection pools are cached
+    pool_maxsize: int
+        Maximum number of connections kept alive per host (should be at least
+        the number of threads sending requests concurrently)
+    headers: dict
+        Headers sent with every request
+    rate: float
+        Maximum requests per second per host (None does not limit the rate)
+    burst: int
+        Maximum number of requests sent at once to a host
+    concurrency: int
+        Maximum number of requests in flight per host
+    timeout: float
+        Seconds to wait for a connection or a response unless a request
+        sets its own timeout
+    failure_threshold: int
+        Number of consecutive failures opening the circuit of a host
+    reset_timeout: float
+        Seconds until an open circuit of a host lets a trial request pass
+
+    Methods
+    -------
+    session(self) -> requests.Session
+        Returns the session of the current process
+    head(self, url, **kwargs) -> requests.Response
+        Sends a HEAD request using the pooled connections (raises a
+        CircuitOpenException while the circuit of the host is open)
+    ahead(self, url, timeout=None) -> Response
+        Sends a HEAD request from the running event loop (keeping
+        pool_maxsize idle connections per host and event loop alive)
+    limiter(self, host) -> HostLimiter
+        Returns the limiter of a host (host[:port])
+    breaker(self, host) -> CircuitBreaker
+        Returns the circuit breaker of a host (host[:port])
+    stats(self) -> dict
+        Returns the stats of the limiter and circuit breaker of each host
+    close(self) -> None
+        Closes all pooled connections
+    """
+    def __init__(self, pool_connections=16, pool_maxsize=32, headers=None,
+                 rate=50.0, burst=10, concurrency=8, timeout=10.0,
+                 failure_threshold=5, reset_timeout=30.0):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.headers = {"User-Agent": "breadp"} if headers is None else headers
+        self.rate = rate
+        self.burst = burst
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._session = None
+        self._limiters = {}
+        self._breakers = {}
+        self._pid = None
+        self._ssl = None
+        # (scheme, host, port) -> idle keep-alive connections of ahead as
+        # (event loop, reader, writer)
+        self._idle = {}
+
+    def session(self):
+        self._check_pid()
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = self._new_session()
+        return self._session
+
+    def head(self, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        session = self.session()
+        host = urlsplit(url).netloc
+        breaker = self._allow(host)
+        limiter = self.limiter(host)
+        try:
+            limiter.acquire()
+        except BaseException:
+            breaker.record(None)
+            raise
+        status_code = None
+        success = False
+        try:
+            response = session.head(url, **kwargs)
+            status_code = response.status_code
+            success = status_code < 500
+            return response
+        except BaseException as e:
+            if not isinstance(e, Exception):
+                success = None
+            raise
+        finally:
+            limiter.release(status_code)
+            breaker.record(success)
+
+    async def ahead(self, url, timeout=None):
+        import asyncio
+        if timeout is None:
+            timeout = self.timeout
+        self._check_pid()
+        host = urlsplit(url).netloc
+        breaker = self._allow(host)
+        limiter = self.limiter(host)
+        try:
+            await limiter.aacquire()
+        except BaseException:
+            # Cancelled while waiting for the limiter, a trial request of
+            # the circuit must not stay pending
+            breaker.record(None)
+            raise
+        status_code = None
+        success = False
+        try:
+            response = await asyncio.wait_for(self._ahead(url), timeout)
+            status_code = response.status_code
+            success = status_code < 500
+            return response
+        except BaseException as e:
+            # A cancelled request (e.g. by the time budget of a check) says
+            # nothing about the host
+            if not isinstance(e, Exception):
+                success = None
+            raise
+        finally:
+            limiter.release(status_code)
+            breaker.record(success)
+
+    def limiter(self, host):
+        with self._lock:
+            limiter = self._limiters.get(host)
+            if limiter is None:
+                limiter = HostLimiter(self.rate, self.burst, self.concurrency)
+                self._limiters[host] = limiter
+            return limiter
+
+    def breaker(self, host):
+        with self._lock:
+            breaker = self._breakers.get(host)
+            if breaker is None:
+                breaker = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+                self._breakers[host] = breaker
+            return breaker
+
+    def stats(self):
+        with self._lock:
+            hosts = set(self._limiters) | set(self._breakers)
+        stats = {}
+        for host in hosts:
+            stats[host] = self.limiter(host).stats()
+            stats[host]["circuit"] = self.breaker(host).stats()
+        return stats
+
+    def close(self):
+        with self._lock:
+            if self._session is not None and self._pid == os.getpid():
+                self._session.close()
+            self._session = None
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for loop, _, writer in connections:
+                _close(loop, writer)
+
+    def _check_pid(self):
+        # Connections and limits must not be shared with forked worker processes
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._session = None
+                    self._idle = {}
+                    self._limiters = {}
+                    self._breakers = {}
+                    self._pid = os.getpid()
+
+    async def _ahead(self, url):
+        """ Sends a HEAD request on an idle keep-alive connection to the host
+            (or a new one) and returns a Response
+        """
+        import asyncio
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https"):
+            raise ValueError("Unsupported URL: {}".format(url))
+        https = parts.scheme == "https"
+        port = parts.port or (443 if https else 80)
+        host = parts.hostname
+        if parts.port is not None:
+            host = "{}:{}".format(host, parts.port)
+        path = quote(parts.path or "/", safe="/:@!$&'()*+,;=%~")
+        if parts.query:
+            path += "?" + quote(parts.query, safe="/:@!$&'()*+,;=%~?")
+        lines = ["HEAD {} HTTP/1.1".format(path), "Host: {}".format(host)]
+        lines += ["{}: {}".format(k, v) for k, v in self.headers.items()]
+        request = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+        key = (parts.scheme, parts.hostname, port)
+        loop = asyncio.get_running_loop()
+        while True:
+            connection = self._idle_connection(key, loop)
+            reused = connection is not None
+            if not reused:
+                connection = await asyncio.open_connection(
+                    parts.hostname,
+                    port,
+                    ssl=self._ssl_context() if https else None
+                )
+            reader, writer = connection
+            try:
+                writer.write(request)
+                await writer.drain()
+                head = await reader.readuntil(b"\r\n\r\n")
+            except (ConnectionError, asyncio.IncompleteReadError):
+                writer.close()
+                # The server closed the idle connection meanwhile
+                if reused:
+                    continue
+                raise
+            except BaseException:
+                writer.close()
+                raise
+            break
+        response, keep_alive = _parse_head(head)
+        if keep_alive:
+            self._release_connection(key, loop, reader, writer)
+        else:
+            writer.close()
+        return response
+
+    def _idle_connection(self, key, loop):
+        """ Returns an idle connection (reader, writer) of the event loop to
+            (scheme, host, port), None if there is none
+        """
+        with self._lock:
+            connections = self._idle.get(key, [])
+            while connections:
+                idle_loop, reader, writer = connections.pop()
+                if idle_loop is loop and not reader.at_eof() \
+                        and not writer.is_closing():
+                    return reader, writer
+                _close(idle_loop, writer)
+        return None
+
+    def _release_connection(self, key, loop, reader, writer):
+        with self._lock:
+            connections = self._idle.setdefault(key, [])
+            if len(connections) < self.pool_maxsize:
+                connections.append((loop, reader, writer))
+                return
+        writer.close()
+
+    def _allow(self, host):
+        breaker = self.breaker(host)
+        if not breaker.allow():
+            raise CircuitOpenException(
+                "Circuit for {} is open, not sending requests".format(host)
+            )
+        return breaker
+
+    def _ssl_context(self):
+        # Creating a context loads the CA certificates (tens of milliseconds
+        # blocking the event loop), all HTTPS requests share one
+        if self._ssl is None:
+            import ssl
+            with self._lock:
+                if self._ssl is None:
+                    self._ssl = ssl.create_default_context()
+        return self._ssl
+
+    def _new_session(self):
+        # requests is imported on first use, it is not needed to import breadp
+        import requests
+        from requests.adapters import HTTPAdapter
+        session = requests.Session()
+        session.headers.update(self.headers)
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+client = HttpClient()
+
+def configure(**kwargs):
+    """ Replaces the shared HttpClient by one with the given settings
+        (see HttpClient)
+    """
+    global client
+    old = client
+    client = HttpClient(**kwargs)
+    old.close()
+
+def head(url, **kwargs):
+    """ Sends a HEAD request with the shared HttpClient
+    """
+    return client.head(url, **kwargs)
+
+async def ahead(url, timeout=None):
+    """ Sends a HEAD request (without following redirects) with the shared
+        HttpClient from the running event loop and returns a Response
+
+    Arguments
+    ---------
+    url: str
+        http(s) URL to request
+    timeout: float
+        Seconds until asyncio.TimeoutError is raised (defaults to the
+        timeout of the HttpClient)
+    """
+    return await client.ahead(url, timeout)
+
+class Response(object):
+    """ Status code and headers of an HTTP response
+
+    Attributes
+    ----------
+    status_code: int
+        Status code of the response
+    headers: HTTPMessage
+        Headers of the response (case-insensitive)
+    """
+    def __init__(self, status_code, headers):
+        self.status_code = status_code
+        self.headers = headers
+
+def _parse_head(head):
+    """ Returns the Response of the status line and headers of an HTTP
+        response and whether the connection may be kept alive
+    """
+    from email.parser import BytesParser
+    from http.client import HTTPMessage
+    status_line, _, header_lines = head.partition(b"\r\n")
+    try:
+        version, status_code = status_line.split()[:2]
+        status_code = int(status_code)
+    except ValueError:
+        raise ValueError("Invalid status line: {!r}".format(status_line))
+    headers = BytesParser(_class=HTTPMessage).parsebytes(header_lines)
+    connection = headers.get("Connection", "").lower()
+    keep_alive = connection == "keep-alive" or \
+        (version == b"HTTP/1.1" and connection != "close")
+    return Response(status_code, headers), keep_alive
+
+def _close(loop, writer):
+    # Transports of closed event loops cannot be closed any more
+    if not loop.is_closed():
+        writer.close()
@@ -0,0 +1,305 @@
+################################################################################
+# Copyright: Tobias Weber 2020
+#
+# Apache 2.0 License
+#
+# This file contains the registry of reference data (IANA media types, SPDX
+# licenses, ISO 639 language codes) used by checks
+#
+# Compile the tables into a memory-mappable file (loaded instead of parsing
+# the resources as long as their hashes match):
+#     python -m breadp.util.reference
+#
+################################################################################
+
+import csv
+from hashlib import sha256
+import json
+import mmap
+import os
+import struct
+import threading
+
+_RESOURCES = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "checks",
+    "resources"
+)
+# Default path of the compiled tables (see build)
+COMPILED = os.path.join(_RESOURCES, "tables.bin")
+
+_MAGIC = b"BREADPREF1\n"
+# number of sources, number of tables
+_HEADER = struct.Struct("<II")
+# size, modification time (ns), sha256 of a source
+_SOURCE = struct.Struct("<QQ32s")
+# number of strings, offset of a table
+_TABLE = struct.Struct("<QQ")
+_LENGTH = struct.Struct("<I")
+_OFFSET = struct.Struct("<Q")
+
+# name -> function loading the table
+_loaders = {}
+# name -> paths of the files the table is loaded from
+_sources = {}
+# names of tables registered again (their compiled tables are outdated)
+_replaced = set()
+# name -> loaded table
+_tables = {}
+# name -> StringTable of the compiled file (None before it was opened)
+_compiled = None
+_lock = threading.Lock()
+
+class StringTable(object):
+    """ Read-only sorted set of strings in a memory-mapped compiled file
+        (see build), membership is tested by binary search. Processes
+        mapping the same file share its pages, the answers for up to
+        memo_size strings are memoized per process.
+
+    Attributes
+    ----------
+    name: str
+        Name of the table
+    memo_size: int
+        Maximum number of memoized answers
+    """
+    __slots__ = ("name", "memo_size", "_mm", "_n", "_offsets", "_data", "_memo")
+
+    def __init__(self, name, mm, n, offset, memo_size=4096):
+        self.name = name
+        self.memo_size = memo_size
+        self._mm = mm
+        self._n = n
+        self._offsets = offset
+        self._data = offset + (n + 1) * _OFFSET.size
+        self._memo = {}
+
+    def __len__(self):
+        return self._n
+
+    def __iter__(self):
+        for i in range(self._n):
+            yield self._string(i).decode("utf-8")
+
+    def __contains__(self, value):
+        found = self._memo.get(value)
+        if found is None:
+            found = self._search(value)
+            if len(self._memo) < self.memo_size:
+                self._memo[value] = found
+        return found
+
+    def _search(self, value):
+        if not isinstance(value, str):
+            return False
+        key = value.encode("utf-8")
+        lo, hi = 0, self._n
+        while lo < hi:
+            mid = (lo + hi) // 2
+            candidate = self._string(mid)
+            if candidate < key:
+                lo = mid + 1
+            elif candidate > key:
+                hi = mid
+            else:
+                return True
+        return False
+
+    def _string(self, i):
+        start, end = struct.unpack_from("<QQ", self._mm, self._offsets + i * _OFFSET.size)
+        return self._mm[self._data + start:self._data + end]
+
+def register(name, loader, sources=()):
+    """ Registers a reference table, loader is called without arguments the
+        first time the table is requested (see get). A table registered
+        again is reloaded. Tables of strings loaded from source files can
+        be compiled (see build).
+    """
+    with _lock:
+        if name in _loaders:
+            _replaced.add(name)
+        _loaders[name] = loader
+        _sources[name] = tuple(sources)
+        _tables.pop(name, None)
+
+def get(name):
+    """ Returns the reference table with the given name, each table is
+        loaded once per process and shared by all callers (tables must not
+        be modified)
+    """
+    table = _tables.get(name)
+    if table is None:
+        with _lock:
+            table = _tables.get(name)
+            if table is None:
+                if name not in _loaders:
+                    raise KeyError("No reference table {}".format(name))
+                table = None
+                if name not in _replaced:
+                    table = _open_compiled().get(name)
+                if table is None:
+                    table = _loaders[name]()
+                _tables[name] = table
+    return table
+
+def clear():
+    """ Drops all loaded tables (they are loaded again on request, the
+        compiled file is validated again)
+    """
+    global _compiled
+    with _lock:
+        _tables.clear()
+        _compiled = None
+
+def build(path=None):
+    """ Writes the registered tables loaded from source files to path as
+        sorted string tables with offsets, together with the size,
+        modification time and hash of each source file. Returns the names of
+        the compiled tables.
+    """
+    if path is None:
+        path = COMPILED
+    names = sorted(name for name in _loaders if _sources[name])
+    sources = sorted({source for name in names for source in _sources[name]})
+    tables = [sorted(s.encode("utf-8") for s in _loaders[name]()) for name in names]
+    header = bytearray(_MAGIC)
+    header += _HEADER.pack(len(sources), len(names))
+    for source in sources:
+        header += _encoded(os.path.relpath(source, _RESOURCES))
+        header += _SOURCE.pack(*_stat(source), _hash(source))
+    for name in names:
+        header += _encoded(name)
+    offset = len(header) + len(names) * _TABLE.size
+    with open(path + ".tmp", "wb") as f:
+        f.write(header)
+        for table in tables:
+            f.write(_TABLE.pack(len(table), offset))
+            offset += (len(table) + 1) * _OFFSET.size + sum(len(s) for s in table)
+        for table in tables:
+            end = 0
+            f.write(_OFFSET.pack(end))
+            for s in table:
+                end += len(s)
+                f.write(_OFFSET.pack(end))
+            for s in table:
+                f.write(s)
+    os.replace(path + ".tmp", path)
+    return names
+
+def load_compiled(path=None):
+    """ Returns the tables (name -> StringTable) of a compiled file, None if
+        the file does not exist, is not a compiled file or a source file
+        changed since it was compiled (source files with another size or
+        modification time are hashed)
+    """
+    if path is None:
+        path = COMPILED
+    try:
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    try:
+        if mm[:len(_MAGIC)] != _MAGIC:
+            raise ValueError("{} is not a compiled reference file".format(path))
+        number_of_sources, number_of_tables = _HEADER.unpack_from(mm, len(_MAGIC))
+        position = len(_MAGIC) + _HEADER.size
+        for _ in range(number_of_sources):
+            source, position = _decoded(mm, position)
+            size, mtime_ns, digest = _SOURCE.unpack_from(mm, position)
+            position += _SOURCE.size
+            source = os.path.join(_RESOURCES, source)
+            if not os.path.exists(source):
+                raise ValueError("{} does not exist".format(source))
+            if _stat(source) != (size, mtime_ns) and _hash(source) != digest:
+                raise ValueError("{} changed".format(source))
+        names = []
+        for _ in range(number_of_tables):
+            name, position = _decoded(mm, position)
+            names.append(name)
+        tables = {}
+        for name in names:
+            n, offset = _TABLE.unpack_from(mm, position)
+            position += _TABLE.size
+            tables[name] = StringTable(name, mm, n, offset)
+        return tables
+    except (ValueError, struct.error):
+        mm.close()
+        return None
+
+def _open_compiled():
+    # called with _lock held
+    global _compiled
+    if _compiled is None:
+        _compiled = load_compiled() or {}
+    return _compiled
+
+def _stat(path):
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
+
+def _hash(path):
+    with open(path, "rb") as f:
+        return sha256(f.read()).digest()
+
+def _encoded(s):
+    s = s.encode("utf-8")
+    return _LENGTH.pack(len(s)) + s
+
+def _decoded(mm, position):
+    length, = _LENGTH.unpack_from(mm, position)
+    position += _LENGTH.size
+    return mm[position:position + length].decode("utf-8"), position + length
+
+def media_types():
+    """ returns the IANA media type templates (frozenset of str, a
+        StringTable if the tables are compiled)
+    """
+    return get("iana-media-types")
+
+def spdx_identifiers():
+    """ returns the SPDX license identifiers (frozenset of str, a
+        StringTable if the tables are compiled)
+    """
+    return get("spdx-license-ids")
+
+def iso_639_1_codes():
+    """ returns the ISO 639-1 (two letter) language codes (frozenset of
+        str, a StringTable if the tables are compiled)
+    """
+    return get("iso-639-1")
+
+def _load_media_types():
+    with open(os.path.join(_RESOURCES, "mediatypes.csv"), newline="") as f:
+        return frozenset(row["Template"] for row in csv.DictReader(f) if row["Template"])
+
+def _load_spdx_identifiers():
+    with open(os.path.join(_RESOURCES, "licenses.json")) as f:
+        return frozenset(l["licenseId"] for l in json.load(f)["licenses"])
+
+def _load_iso_639_1_codes():
+    with open(os.path.join(_RESOURCES, "iso-639.json")) as f:
+        return frozenset(l["alpha2"] for l in json.load(f) if l["alpha2"] is not None)
+
+register("iana-media-types", _load_media_types,
+         [os.path.join(_RESOURCES, "mediatypes.csv")])
+register("spdx-license-ids", _load_spdx_identifiers,
+         [os.path.join(_RESOURCES, "licenses.json")])
+register("iso-639-1", _load_iso_639_1_codes,
+         [os.path.join(_RESOURCES, "iso-639.json")])
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(
+        description="Compiles the reference tables into a memory-mappable file"
+    )
+    parser.add_argument(
+        "path",
+        nargs="?",
+        default=COMPILED,
+        help="file to write (default: {})".format(COMPILED)
+    )
+    args = parser.parse_args()
+    for name in build(args.path):
+        print("Compiled {} ({} entries)".format(name, len(get(name))))
+    print("Wrote {}".format(args.path))
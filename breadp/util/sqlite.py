@@ -0,0 +1,201 @@
+################################################################################
+# Copyright: Tobias Weber 2020
+#
+# Apache 2.0 License
+#
+# This file contains all code related to SQLite-backed log objects
+#
+################################################################################
+
+import json
+import sqlite3
+import threading
+
+import breadp.checks.result
+from breadp.util.log import CheckLogEntry
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS check_log (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    check_id,
+    check_version TEXT,
+    pid TEXT,
+    start_ns INTEGER,
+    end_ns INTEGER,
+    success INTEGER,
+    type TEXT,
+    outcome TEXT,
+    msg TEXT
+);
+CREATE INDEX IF NOT EXISTS check_log_pid
+    ON check_log (check_id, check_version, pid, seq);
+"""
+
+_COLUMNS = "start_ns, end_ns, pid, success, type, outcome, msg"
+
+class SqliteLog(object):
+    """ Log of check log entries persisted in a local SQLite file.
+
+        All checks (and processes) can share one file, entries are scoped by
+        check id and check version. Added entries are buffered and written in
+        one transaction once batch_size entries are pending (or on flush/close).
+        The database runs in WAL mode, so readers do not block the writer.
+
+        Note: Retention policies are not supported by this log.
+        All methods are safe to be called from several threads.
+
+    Attributes
+    ----------
+    path: str
+        Path to the SQLite file
+    check_id: int
+        Id of the check the log belongs to
+    check_version: str
+        Version of the check the log belongs to
+    batch_size: int
+        Number of pending entries which triggers a write
+
+    Methods
+    -------
+    add(self, le) -> None
+        Adds a check log entry
+    get_by_pid(self, pid) -> list
+        Returns all log entries for the given PID (in insertion order)
+    get_last_by_pid(self, pid) -> CheckLogEntry
+        Returns the last log entry for the given PID (None if there is none)
+    flush(self) -> None
+        Writes all pending entries
+    close(self) -> None
+        Writes all pending entries and closes the database connection
+    """
+    def __init__(self, path, check_id, check_version, batch_size=1000):
+        self._lock = threading.RLock()
+        self.path = path
+        self.check_id = check_id
+        self.check_version = check_version
+        self.batch_size = batch_size
+        self._pending = []
+        self._pending_by_pid = {}
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    @classmethod
+    def for_check(cls, path, batch_size=1000):
+        """ Returns a factory for Benchmark.set_logs storing all logs in path
+        """
+        def factory(check):
+            return cls(path, check.id, check.version, batch_size)
+        return factory
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        with self._lock:
+            (count,) = self._db.execute(
+                "SELECT COUNT(*) FROM check_log WHERE check_id = ? AND check_version = ?",
+                (self.check_id, self.check_version)
+            ).fetchone()
+            return count + len(self._pending)
+
+    @property
+    def log(self):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT {} FROM check_log WHERE check_id = ? AND check_version = ? "
+                "ORDER BY seq".format(_COLUMNS),
+                (self.check_id, self.check_version)
+            )
+            return [_entry(row) for row in rows] + list(self._pending)
+
+    @property
+    def retention(self):
+        return []
+
+    @retention.setter
+    def retention(self, retention):
+        if retention:
+            raise ValueError("SqliteLog does not support retention policies")
+
+    def pin(self, pid):
+        pass
+
+    def unpin(self, pid):
+        pass
+
+    def add(self, le):
+        with self._lock:
+            rtype = type(le.result)
+            if getattr(breadp.checks.result, rtype.__name__, None) is not rtype:
+                raise ValueError("Cannot persist results of type {}".format(
+                    rtype.__name__))
+            self._pending.append(le)
+            self._pending_by_pid.setdefault(le.pid, []).append(le)
+            if len(self._pending) >= self.batch_size:
+                self.flush()
+
+    def get_by_pid(self, pid):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT {} FROM check_log WHERE check_id = ? AND check_version = ? "
+                "AND pid = ? ORDER BY seq".format(_COLUMNS),
+                (self.check_id, self.check_version, pid)
+            )
+            return [_entry(row) for row in rows] + self._pending_by_pid.get(pid, [])
+
+    def get_last_by_pid(self, pid):
+        with self._lock:
+            pending = self._pending_by_pid.get(pid)
+            if pending:
+                return pending[-1]
+            row = self._db.execute(
+                "SELECT {} FROM check_log WHERE check_id = ? AND check_version = ? "
+                "AND pid = ? ORDER BY seq DESC LIMIT 1".format(_COLUMNS),
+                (self.check_id, self.check_version, pid)
+            ).fetchone()
+            if row is None:
+                return None
+            return _entry(row)
+
+    def flush(self):
+        with self._lock:
+            if not self._pending:
+                return
+            with self._db:
+                self._db.executemany(
+                    "INSERT INTO check_log (check_id, check_version, {}) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)".format(_COLUMNS),
+                    [self._row(le) for le in self._pending]
+                )
+            self._pending = []
+            self._pending_by_pid = {}
+
+    def close(self):
+        with self._lock:
+            self.flush()
+            self._db.close()
+
+    def _row(self, le):
+        return (
+            self.check_id,
+            self.check_version,
+            le.start_ns,
+            le.end_ns,
+            le.pid,
+            int(le.result.success),
+            type(le.result).__name__,
+            json.dumps(getattr(le.result, "outcome", None)),
+            le.result.msg
+        )
+
+def _entry(row):
+    start_ns, end_ns, pid, success, rtype, outcome, msg = row
+    result = breadp.checks.result.load(
+        [rtype, json.loads(outcome), msg, bool(success)]
+    )
+    return CheckLogEntry(start_ns, end_ns, pid, result)
@@ -0,0 +1,65 @@
+################################################################################
+# Copyright: Tobias Weber 2020
+#
+# Apache 2.0 License
+#
+# Reports p50/p99 latencies of DoiResolvesCheck against a local stand-in for
+# doi.org which stalls on some requests (3% by default) for a second,
+# without and with a time budget
+#
+# Usage: python perf/check_latency.py [number of RDPs] [stall ratio]
+#
+################################################################################
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import random
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+from breadp.checks.pid import DoiResolvesCheck
+from breadp.reports import LatencyReport
+from breadp.util import net
+
+STALL = 1.0
+STALL_RATIO = 0.03
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    stall_ratio = STALL_RATIO
+
+    def do_HEAD(self):
+        if random.random() < self.stall_ratio:
+            time.sleep(STALL)
+        self.send_response(302)
+        self.send_header("Location", "https://zenodo.org/record/3490396")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    Handler.stall_ratio = float(sys.argv[2]) if len(sys.argv) > 2 else STALL_RATIO
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    net.configure(rate=None)
+    rdps = [SimpleNamespace(pid="10.5281/zenodo.{}".format(i)) for i in range(n)]
+    for timeout in (None, 0.1):
+        check = DoiResolvesCheck()
+        check.resolver = "http://127.0.0.1:{}/".format(server.server_address[1])
+        check.timeout = timeout
+        for rdp in rdps:
+            check.check(rdp)
+        report = LatencyReport(check)
+        print("timeout {:>5}: p50 {:>8.2f} ms, p99 {:>8.2f} ms, max {:>8.2f} ms, {} timeouts".format(
+            str(timeout),
+            report.p50_ns / 10 ** 6,
+            report.p99_ns / 10 ** 6,
+            report.max_ns / 10 ** 6,
+            report.timeouts
+        ))
+    server.shutdown()
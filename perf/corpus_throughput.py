@@ -0,0 +1,82 @@
+################################################################################
+# Copyright: Tobias Weber 2020
+#
+# Apache 2.0 License
+#
+# Measures the throughput of run_corpus over a synthetic corpus for different
+# numbers of worker processes. Every RDP has its own title and description
+# and the language cache is cleared before each run, so languages are
+# detected for each RDP.
+#
+# Usage: python perf/corpus_throughput.py [number of RDPs] [max processes]
+#
+################################################################################
+
+import os
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+from breadp.benchmarks import Benchmark
+from breadp.benchmarks.runner import run_corpus, score
+from breadp.checks import metadata
+from breadp.checks.metadata import \
+    DescriptionsLanguageCheck, \
+    DescriptionsLengthCheck, \
+    SizesByteSizeCheck, \
+    TitlesJustAFileNameCheck, \
+    TitlesLanguageCheck
+from breadp.evaluations import \
+    ContainsAllEvaluation, \
+    FalseEvaluation, \
+    IsBetweenEvaluation, \
+    TheMoreTrueTheBetterEvaluation
+
+WORDS = ("research data product benchmark metadata description title "
+         "quality survey measurement results analysis").split()
+
+class SyntheticRdp(object):
+    def __init__(self, i):
+        self.pid = "10.5281/synthetic.{}".format(i)
+        rng = random.Random(i)
+        words = [rng.choice(WORDS) for _ in range(40)]
+        self.metadata = SimpleNamespace(
+            titles=[SimpleNamespace(text=" ".join(words[:8]), type=None)],
+            descriptions=[SimpleNamespace(text=" ".join(words), type="Abstract")],
+            sizes=["{} MB".format(i % 1000)]
+        )
+
+class SyntheticBenchmark(Benchmark):
+    """ CPU-bound metadata checks on synthetic RDPs
+    """
+    def __init__(self):
+        Benchmark.__init__(self)
+        self.add_evaluation(ContainsAllEvaluation([TitlesLanguageCheck()], ["en"]))
+        self.add_evaluation(ContainsAllEvaluation([DescriptionsLanguageCheck()], ["en"]))
+        self.add_evaluation(FalseEvaluation([TitlesJustAFileNameCheck()]))
+        self.add_evaluation(IsBetweenEvaluation([DescriptionsLengthCheck()], 1, 300))
+        self.add_evaluation(TheMoreTrueTheBetterEvaluation([SizesByteSizeCheck()]))
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    max_processes = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count()
+    corpus = [SyntheticRdp(i) for i in range(n)]
+
+    b = SyntheticBenchmark()
+    metadata.configure_language_cache()
+    start = time.perf_counter()
+    for rdp in corpus:
+        score(b, rdp)
+    elapsed = time.perf_counter() - start
+    print("{:>9} {:>10.1f} RDPs/s".format("serial", n / elapsed))
+
+    processes = 1
+    while processes <= max_processes:
+        metadata.configure_language_cache()
+        start = time.perf_counter()
+        for report in run_corpus(corpus, SyntheticBenchmark, processes, chunksize=20):
+            assert "error" not in report, report
+        elapsed = time.perf_counter() - start
+        print("{:>9} {:>10.1f} RDPs/s".format(processes, n / elapsed))
+        processes *= 2
@@ -0,0 +1,69 @@
+################################################################################
+# Copyright: Tobias Weber 2020
+#
+# Apache 2.0 License
+#
+# Measures build time, size and lookup cost of the offline DOI index compared
+# to HEAD requests against a local HTTP/1.1 stand-in for doi.org
+#
+# Usage: python perf/doi_index.py [number of DOIs] [number of lookups]
+#
+################################################################################
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+from breadp.util.doiindex import build, DoiIndex
+from breadp.util.net import HttpClient
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_HEAD(self):
+        self.send_response(302)
+        self.send_header("Location", "https://zenodo.org/record/3490396")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    lookups = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+    dois = ["10.5281/zenodo.{}".format(i) for i in range(0, 2 * n, 2)]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "dois.idx")
+        t0 = time.perf_counter()
+        build(dois, path)
+        print("build:         {:>10.1f} s ({:,} DOIs, {:,.1f} MB)".format(
+            time.perf_counter() - t0, n, os.path.getsize(path) / 2 ** 20))
+        with DoiIndex(path) as index:
+            for name, offset in (("hit", 0), ("miss", 1)):
+                sample = ["10.5281/zenodo.{}".format(2 * random.randrange(n) + offset)
+                          for _ in range(lookups)]
+                t0 = time.perf_counter()
+                for doi in sample:
+                    doi in index
+                elapsed = time.perf_counter() - t0
+                print("index {:<8} {:>10.1f} us".format(name + ":", elapsed / lookups * 10 ** 6))
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = "http://127.0.0.1:{}/".format(server.server_address[1])
+    client = HttpClient(rate=None)
+    requests = min(lookups, 1000)
+    t0 = time.perf_counter()
+    for doi in dois[:requests]:
+        client.head(base + doi)
+    elapsed = time.perf_counter() - t0
+    print("local HEAD:    {:>10.1f} us (pooled, no TLS, no resolver latency)".format(
+        elapsed / requests * 10 ** 6))
+    client.close()
+    server.shutdown()
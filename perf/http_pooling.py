@@ -0,0 +1,58 @@
+################################################################################
+# Copyright: Tobias Weber 2020
+#
+# Apache 2.0 License
+#
+# Measures HEAD requests per second against a local HTTP/1.1 stand-in for
+# doi.org with a new connection per request (requests.head) and with the
+# pooled keep-alive connections of breadp.util.net
+#
+# Usage: python perf/http_pooling.py [number of requests] [threads]
+#
+################################################################################
+
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import sys
+import threading
+import time
+
+import requests
+
+from breadp.util.net import HttpClient
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_HEAD(self):
+        self.send_response(302)
+        self.send_header("Location", "https://zenodo.org/record/3490396")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+def measure(head, urls, threads):
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        for response in executor.map(head, urls):
+            assert response.status_code == 302
+    return len(urls) / (time.perf_counter() - t0)
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = "http://127.0.0.1:{}/10.5281/zenodo.".format(server.server_address[1])
+    urls = [base + str(i) for i in range(n)]
+
+    client = HttpClient(pool_maxsize=threads, rate=None)
+    print("unpooled:  {:>10,.0f} requests/s ({:,} requests, {} threads)".format(
+        measure(requests.head, urls, threads), n, threads))
+    print("pooled:    {:>10,.0f} requests/s ({:,} requests, {} threads)".format(
+        measure(client.head, urls, threads), n, threads))
+    client.close()
+    server.shutdown()
@@ -0,0 +1,97 @@
+################################################################################
+# Copyright: Tobias Weber 2020
+#
+# Apache 2.0 License
+#
+# Measures (with python -X importtime) the time spent importing breadp and
+# constructing BPGBenchmark, excluding the time spent in rdp (a dependency
+# of all checks). Exits with status 1 if a threshold is exceeded or a heavy
+# dependency is imported by breadp itself.
+#
+# Usage: python perf/import_time.py [threshold import breadp (ms)]
+#                                   [threshold BPGBenchmark (ms)]
+#
+################################################################################
+
+import subprocess
+import sys
+
+# Dependencies which must only be imported by the checks using them
+HEAVY = ("asyncio", "langdetect", "pandas", "requests")
+
+CONSTRUCT = """
+import time
+start = time.perf_counter_ns()
+from breadp.benchmarks.example import BPGBenchmark
+BPGBenchmark()
+print(time.perf_counter_ns() - start)
+"""
+
+def importtime(code):
+    """ Runs code in a fresh interpreter and returns its output and the
+        imports as list of [name, self us, cumulative us, parent name]
+    """
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True
+    )
+    imports = []
+    # depth -> imports at this depth whose parent was not printed yet
+    # (importtime prints a module after the modules it imports)
+    pending = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entry = [name.strip(), int(self_us), int(cumulative_us), None]
+        for child in pending.pop(depth + 1, []):
+            child[3] = entry[0]
+        pending.setdefault(depth, []).append(entry)
+        imports.append(entry)
+    return process.stdout, imports
+
+def breadp_us(imports):
+    """ Returns the microseconds spent in breadp's modules and the modules
+        they imported (except rdp)
+    """
+    total = 0
+    for name, self_us, cumulative_us, parent in imports:
+        if name.split(".")[0] == "breadp":
+            total += self_us
+        elif parent is not None and parent.split(".")[0] == "breadp" \
+                and name.split(".")[0] != "rdp":
+            total += cumulative_us
+    return total
+
+def heavy_imports(imports):
+    """ Returns the heavy dependencies imported by breadp's modules
+    """
+    return sorted(
+        "{} (by {})".format(name, parent) for name, _, _, parent in imports
+        if name.split(".")[0] in HEAVY
+        and parent is not None and parent.split(".")[0] == "breadp"
+    )
+
+if __name__ == "__main__":
+    thresholds = [float(a) for a in sys.argv[1:3]] + [20.0, 100.0][len(sys.argv[1:3]):]
+    failed = False
+    for (label, code), threshold in zip(
+            [("import breadp", "import breadp"),
+             ("import and construct BPGBenchmark", CONSTRUCT)],
+            thresholds):
+        output, imports = importtime(code)
+        ms = breadp_us(imports) / 1000
+        print("{}: {:.1f} ms in breadp (threshold {:.0f} ms)".format(label, ms, threshold))
+        if output.strip():
+            # the last line is the time measured by CONSTRUCT
+            ns = int(output.split()[-1])
+            print("  wall clock incl. rdp: {:.1f} ms".format(ns / 10**6))
+        heavy = heavy_imports(imports)
+        if heavy:
+            print("  heavy imports: {}".format(", ".join(heavy)))
+        failed = failed or ms > threshold or len(heavy) > 0
+    sys.exit(1 if failed else 0)
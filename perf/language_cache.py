@@ -0,0 +1,81 @@
+################################################################################
+# Copyright: Tobias Weber 2020
+#
+# Apache 2.0 License
+#
+# Measures the language detection of a corpus whose titles and descriptions
+# repeat across RDPs (as across versions of a record) without and with the
+# shared language cache, in memory and persisted for a second run
+#
+# Usage: python perf/language_cache.py [number of RDPs] [distinct records]
+#
+################################################################################
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+from breadp.checks import metadata
+
+WORDS = {
+    "en": "the data set contains measurements of temperature and humidity "
+          "collected by sensors in several cities during the year".split(),
+    "de": "der datensatz enthält messungen der temperatur und feuchtigkeit "
+          "die von sensoren in mehreren städten während des jahres".split(),
+    "fr": "le jeu de données contient des mesures de température et "
+          "humidité collectées par des capteurs dans plusieurs villes".split()
+}
+
+def record(rng):
+    words = WORDS[rng.choice(sorted(WORDS))]
+    title = " ".join(rng.choice(words) for _ in range(8))
+    description = " ".join(rng.choice(words) for _ in range(80))
+    return [title, description]
+
+def corpus(n, distinct):
+    rng = random.Random(0)
+    records = [record(rng) for _ in range(distinct)]
+    # Versions and series make some records far more frequent than others
+    return [records[min(int(rng.paretovariate(1.0)) - 1, distinct - 1)]
+            if rng.random() < 0.5 else rng.choice(records)
+            for _ in range(n)]
+
+def run(rdps, detect):
+    start = time.perf_counter()
+    for texts in rdps:
+        detect(texts)
+    return time.perf_counter() - start
+
+def uncached(texts):
+    return {text: metadata._detect_language(text)[0] for text in set(texts)}
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    distinct = int(sys.argv[2]) if len(sys.argv) > 2 else 400
+    rdps = corpus(n, distinct)
+    metadata._detect_language("warm up")
+    before = run(rdps, uncached)
+    print("{} RDPs, {} distinct records".format(n, distinct))
+    print("without cache:        {:.2f}s".format(before))
+    metadata.configure_language_cache()
+    after = run(rdps, metadata.detect_languages)
+    print("with cache:           {:.2f}s ({:.1f}x, hit rate {:.1%})".format(
+        after,
+        before / after,
+        metadata.language_cache.stats()["hit_rate"]
+    ))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "languages.sqlite")
+        metadata.configure_language_cache(path=path)
+        run(rdps, metadata.detect_languages)
+        # A second run (or another worker) starts with the persisted entries
+        metadata.configure_language_cache(path=path)
+        second = run(rdps, metadata.detect_languages)
+        print("second run persisted: {:.2f}s ({:.1f}x, hit rate {:.1%})".format(
+            second,
+            before / second,
+            metadata.language_cache.stats()["hit_rate"]
+        ))
+        metadata.configure_language_cache()
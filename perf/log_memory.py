@@ -0,0 +1,47 @@
+################################################################################
+# Copyright: Tobias Weber 2020
+#
+# Apache 2.0 License
+#
+# Compares the memory held by Log and ColumnarLog for synthetic check results
+#
+# Usage: python perf/log_memory.py [number of entries]
+#
+################################################################################
+
+import sys
+import time
+import tracemalloc
+
+from breadp.checks.result import BooleanResult, ListResult, MetricResult
+from breadp.util.columnar import ColumnarLog
+from breadp.util.log import CheckLogEntry, Log
+
+def synthetic_entries(n):
+    start = time.time_ns()
+    for i in range(n):
+        pid = "10.5281/zenodo.{}".format(i // 38)
+        if i % 3 == 0:
+            result = BooleanResult(i % 2 == 0, "", True)
+        elif i % 3 == 1:
+            result = MetricResult(i % 100, "", True)
+        else:
+            result = ListResult([i % 300, 3], "", True)
+        begin = start + i * 10000
+        yield CheckLogEntry(begin, begin + 5000, pid, result)
+
+def measure(log_class, n):
+    tracemalloc.start()
+    log = log_class()
+    for le in synthetic_entries(n):
+        log.add(le)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    for log_class in (Log, ColumnarLog):
+        size = measure(log_class, n)
+        print("{:<12} {:>12,} bytes {:>8.1f} bytes/entry".format(
+            log_class.__name__, size, size / n))
@@ -0,0 +1,99 @@
+################################################################################
+# Copyright: Tobias Weber 2020
+#
+# Apache 2.0 License
+#
+# Measures the cost of the reference data lookups of the media type, SPDX and
+# ISO 639 checks: loading the tables with pandas on every call (as before the
+# registry, skipped if pandas is not installed) vs. the shared registry, and the
+# cold start of parsing the resources vs. mapping the compiled tables
+#
+# Usage: python perf/reference_lookup.py [number of lookups]
+#
+################################################################################
+
+import json
+import os
+import sys
+import tempfile
+import time
+
+from breadp.util import reference
+
+RESOURCES = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "breadp",
+    "checks",
+    "resources"
+)
+
+def per_call(function, n):
+    start = time.perf_counter_ns()
+    for _ in range(n):
+        function()
+    return (time.perf_counter_ns() - start) / n
+
+def report(name, before_ns, after_ns):
+    if before_ns is None:
+        print("{:<12} registry: {:>8.3f} us".format(name, after_ns / 1000))
+    else:
+        print("{:<12} pandas: {:>8.3f} ms  registry: {:>8.3f} us  ({:.0f}x)".format(
+            name,
+            before_ns / 10**6,
+            after_ns / 1000,
+            before_ns / after_ns
+        ))
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    try:
+        import pandas as pd
+    except ImportError:
+        pd = None
+    start = time.perf_counter_ns()
+    reference._load_media_types()
+    reference._load_spdx_identifiers()
+    reference._load_iso_639_1_codes()
+    print("parsing all resources: {:.1f} ms".format(
+        (time.perf_counter_ns() - start) / 10**6
+    ))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "tables.bin")
+        reference.build(path)
+        start = time.perf_counter_ns()
+        tables = reference.load_compiled(path)
+        print("loading the compiled tables: {:.1f} us ({} bytes)".format(
+            (time.perf_counter_ns() - start) / 1000,
+            os.path.getsize(path)
+        ))
+        compiled = tables["spdx-license-ids"]
+        print("compiled SPDX lookup: {:.3f} us (first) {:.3f} us (memoized)".format(
+            per_call(lambda: compiled._search("CC-BY-4.0"), 10000) / 1000,
+            per_call(lambda: "CC-BY-4.0" in compiled, n) / 1000
+        ))
+
+    before = None
+    if pd is not None:
+        path = os.path.join(RESOURCES, "mediatypes.csv")
+        before = per_call(
+            lambda: "application/json" in set(pd.read_csv(path).Template.tolist()),
+            20
+        )
+    report("media type", before, per_call(
+        lambda: "application/json" in reference.media_types(), n
+    ))
+
+    if pd is not None:
+        with open(os.path.join(RESOURCES, "licenses.json")) as f:
+            licenses = pd.DataFrame(json.load(f)["licenses"])
+        before = per_call(lambda: "CC-BY-4.0" in licenses.licenseId.tolist(), 1000)
+    report("SPDX", before, per_call(
+        lambda: "CC-BY-4.0" in reference.spdx_identifiers(), n
+    ))
+
+    if pd is not None:
+        iso_codes = pd.read_json(os.path.join(RESOURCES, "iso-639.json"))
+        before = per_call(lambda: "zu" in iso_codes.alpha2.tolist(), 1000)
+    report("ISO 639-1", before, per_call(
+        lambda: "zu" in reference.iso_639_1_codes(), n
+    ))
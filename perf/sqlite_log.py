@@ -0,0 +1,54 @@
+################################################################################
+# Copyright: Tobias Weber 2020
+#
+# Apache 2.0 License
+#
+# Measures inserts per second and lookup latency of SqliteLog
+#
+# Usage: python perf/sqlite_log.py [number of entries] [batch size]
+#
+################################################################################
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+from breadp.checks.result import ListResult
+from breadp.util.log import CheckLogEntry
+from breadp.util.sqlite import SqliteLog
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    now = time.time_ns()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "log.sqlite")
+        with SqliteLog(path, 3, "0.0.1", batch_size) as log:
+            t0 = time.perf_counter()
+            for i in range(n):
+                log.add(CheckLogEntry(
+                    now,
+                    now,
+                    "10.5281/zenodo.{}".format(i),
+                    ListResult([i % 300, 3], "", True)
+                ))
+            log.flush()
+            elapsed = time.perf_counter() - t0
+            print("inserts:      {:>12,.0f} entries/s ({:,} entries, batch size {})".format(
+                n / elapsed, n, batch_size))
+
+            lookups = 10000
+            pids = ["10.5281/zenodo.{}".format(random.randrange(n)) for _ in range(lookups)]
+            t0 = time.perf_counter()
+            for pid in pids:
+                log.get_last_by_pid(pid)
+            elapsed = time.perf_counter() - t0
+            print("last lookup:  {:>12.1f} us".format(elapsed / lookups * 10 ** 6))
+
+            t0 = time.perf_counter()
+            for pid in pids:
+                log.get_by_pid(pid)
+            elapsed = time.perf_counter() - t0
+            print("pid lookup:   {:>12.1f} us".format(elapsed / lookups * 10 ** 6))
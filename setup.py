@@ -16,13 +16,16 @@ setup(
     url='https://github.com/tgweber/breadp',
     license=license,
     package_data = {
-        "breadp": ["checks/resources/*.json", "checks/resources/*.csv"]
+        "breadp": [
+            "checks/resources/*.json",
+            "checks/resources/*.csv",
+            "checks/resources/*.bin"
+        ]
     },
     include_package_data=True,
     packages=find_packages(exclude=('tests', 'docs')),
     install_requires=["rdp @ git+https://github.com/tgweber/rdp",
                       "langdetect @ git+https://github.com/Mimino666/langdetect",
-                      "pandas",
                       "requests"]
 
 )
@@ -0,0 +1,20 @@
+################################################################################
+# Copyright: Tobias Weber 2020
+#
+# Apache 2.0 License
+#
+# This file contains fixtures shared by all tests
+#
+################################################################################
+
+import pytest
+import requests
+
+from breadp.util import net
+
+@pytest.fixture(autouse=True)
+def unpooled_head(monkeypatch):
+    """ Routes HEAD requests of checks through requests.head, so that tests
+        can mock it
+    """
+    monkeypatch.setattr(net, "head", lambda url, **kwargs: requests.head(url, **kwargs))
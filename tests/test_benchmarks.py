@@ -7,17 +7,43 @@
 #
 ################################################################################
 
+import asyncio
+import json
 from unittest import mock
 import pytest
 from rdp import RdpFactory, Rdp
 from rdp.exceptions import CannotCreateRDPException
+import requests
+import time
 
 from breadp.benchmarks import Benchmark
 from breadp.benchmarks.example import BPGBenchmark
+from breadp.benchmarks.runner import arun_corpus, rescore, run_corpus
+from breadp.checks import Check
 from breadp.checks.metadata import DescriptionsNumberCheck
-from breadp.evaluations import IsBetweenEvaluation
+from breadp.checks.result import BooleanResult
+from breadp.reports import BenchmarkReport
+from breadp.evaluations import FalseEvaluation, IsBetweenEvaluation, TrueEvaluation
+from breadp.util.log import KeepLastNPolicy
 
-from util import mocked_requests_get, mocked_requests_head, get_rdps
+from util import \
+    get_rdps, \
+    local_server, \
+    mocked_requests_get, \
+    mocked_requests_head
+
+class _HeadCheck(Check):
+    """ Checks whether a HEAD request to the given URL succeeds
+    """
+    def __init__(self, check_id, url):
+        Check.__init__(self)
+        self.id = check_id
+        self.version = "0.0.1"
+        self.url = url
+
+    def _do_check(self, rdp):
+        response = requests.head(self.url)
+        return BooleanResult(response.status_code == 200, "", True)
 
 @mock.patch('requests.head', side_effect=mocked_requests_head)
 @mock.patch('requests.get', side_effect=mocked_requests_get)
@@ -66,3 +92,286 @@ def test_benchmark(mock_get, mock_head):
         b.check_all(rdp)
         str(e).endswith("429")
 
+
+@mock.patch('requests.head', side_effect=mocked_requests_head)
+@mock.patch('requests.get', side_effect=mocked_requests_get)
+def test_benchmark_retention(mock_get, mock_head):
+    rdps = get_rdps()
+    b = Benchmark()
+    b.add_evaluation(IsBetweenEvaluation([DescriptionsNumberCheck()], 1, 100))
+    b.set_retention(KeepLastNPolicy(1))
+    with b.hold(rdps[0].pid):
+        b.check_all(rdps[0])
+        b.check_all(rdps[1])
+        assert b.score(rdps[0]) == 1
+        assert b.score(rdps[1]) == 0
+    assert len(b.checks[0].log) == 1
+    assert b.checks[0].get_last_result(rdps[0].pid) is None
+
+@mock.patch('requests.head', side_effect=mocked_requests_head)
+@mock.patch('requests.get', side_effect=mocked_requests_get)
+def test_benchmark_check_batch(mock_get, mock_head):
+    rdps = get_rdps()
+    bb = BPGBenchmark()
+    for rdp in rdps:
+        bb.check_all(rdp)
+    batched = BPGBenchmark()
+    batched.check_batch(rdps)
+    for rdp in rdps:
+        assert batched.score(rdp) == bb.score(rdp)
+
+@mock.patch('requests.head', side_effect=mocked_requests_head)
+@mock.patch('requests.get', side_effect=mocked_requests_get)
+def test_benchmark_plan(mock_get, mock_head):
+    rdps = get_rdps()
+    bb = BPGBenchmark()
+    planned = BPGBenchmark()
+    batched = BPGBenchmark()
+    for rdp in rdps:
+        bb.check_all(rdp)
+        planned.check_all(rdp, plan=True)
+    batched.check_batch(rdps, plan=True)
+    for rdp in rdps:
+        assert planned.score(rdp) == bb.score(rdp)
+        assert batched.score(rdp) == bb.score(rdp)
+    assert planned.checks_saved > 0
+    assert planned.checks_run + planned.checks_saved == len(rdps) * len(planned.checks)
+    assert batched.checks_saved == planned.checks_saved
+    assert bb.checks_saved == 0
+    report = BenchmarkReport(rdps[8], planned)
+    assert len(report.check_reports) + len(report.skipped_checks) == len(planned.checks)
+    assert len(planned.plan(rdps[8])) == len(report.check_reports)
+
+def test_benchmark_plan_shared_check():
+    shared = _SleepCheck(0, 0)
+    only_skipped = _SleepCheck(1, 0)
+    b = Benchmark()
+    b.add_evaluation(TrueEvaluation([shared, only_skipped]))
+    b.add_evaluation(FalseEvaluation([shared]))
+    b.skip = lambda e, rdp: isinstance(e, TrueEvaluation)
+    rdp = Rdp("10.123/1")
+    assert b.plan(rdp) == [shared]
+    b.check_all(rdp, plan=True)
+    assert shared.get_last_result(rdp.pid) is not None
+    assert only_skipped.get_last_result(rdp.pid) is None
+    assert (b.checks_run, b.checks_saved) == (1, 1)
+
+@mock.patch('requests.head', side_effect=mocked_requests_head)
+@mock.patch('requests.get', side_effect=mocked_requests_get)
+def test_benchmark_lazy_score(mock_get, mock_head):
+    rdps = get_rdps()
+    bb = BPGBenchmark()
+    lazy = BPGBenchmark()
+    for rdp in rdps:
+        bb.check_all(rdp)
+        assert lazy.score(rdp, lazy=True) == bb.score(rdp)
+    assert lazy.checks_saved > 0
+    assert all(c.cost_ns is not None for c in bb.checks)
+
+class _FailingCheck(Check):
+    """ Fails
+    """
+    def __init__(self, check_id):
+        Check.__init__(self)
+        self.id = check_id
+        self.version = "0.0.1"
+
+    def _do_check(self, rdp):
+        return BooleanResult(False, "Failed", False)
+
+def test_benchmark_lazy_score_short_circuits():
+    expensive = _SleepCheck(0, 0)
+    cheap = _FailingCheck(1)
+    expensive.cost_ns = 10 ** 9
+    cheap.cost_ns = 10 ** 6
+    b = Benchmark()
+    b.add_evaluation(TrueEvaluation([expensive, cheap]))
+    rdp = Rdp("10.123/1")
+    assert b.score(rdp, lazy=True) == 0
+    assert expensive.get_last_result(rdp.pid) is None
+    assert (b.checks_run, b.checks_saved) == (1, 1)
+    assert cheap.cost_ns != 10 ** 6
+
+def test_benchmark_check_all_concurrently():
+    delay = 0.3
+    def respond(path):
+        time.sleep(delay)
+        return 200, {}
+    with local_server(respond) as url:
+        b = Benchmark()
+        b.add_evaluation(TrueEvaluation([_HeadCheck(i, url) for i in range(3)]))
+        rdp = Rdp("10.123/1")
+        start = time.perf_counter()
+        b.check_all(rdp)
+        sequential = time.perf_counter() - start
+        start = time.perf_counter()
+        b.check_all(rdp, max_workers=3)
+        concurrent = time.perf_counter() - start
+    # sum(RTT) vs. max(RTT)
+    assert sequential >= 3 * delay
+    assert concurrent < 2 * delay
+    assert b.score(rdp) == 1
+    for c in b.checks:
+        assert len(c.log) == 2
+
+def test_benchmark_acheck_all():
+    delay = 0.3
+    def respond(path):
+        time.sleep(delay)
+        return 200, {}
+    with local_server(respond) as url:
+        b = Benchmark()
+        b.add_evaluation(TrueEvaluation([_HeadCheck(i, url) for i in range(3)]))
+        rdp = Rdp("10.123/1")
+        start = time.perf_counter()
+        asyncio.run(b.acheck_all(rdp))
+        concurrent = time.perf_counter() - start
+        asyncio.run(b.acheck_all(rdp, concurrency=1))
+    assert concurrent < 2 * delay
+    assert b.score(rdp) == 1
+    for c in b.checks:
+        assert len(c.log) == 2
+
+class _SleepCheck(Check):
+    """ Sleeps
+    """
+    def __init__(self, check_id, delay):
+        Check.__init__(self)
+        self.id = check_id
+        self.version = "0.0.1"
+        self.delay = delay
+
+    def _do_check(self, rdp):
+        time.sleep(self.delay)
+        return BooleanResult(True, "", True)
+
+def test_benchmark_deadline():
+    b = Benchmark()
+    b.add_evaluation(TrueEvaluation([_SleepCheck(0, 0.01)]))
+    b.add_evaluation(TrueEvaluation([_SleepCheck(1, 1)]))
+    b.add_evaluation(TrueEvaluation([_SleepCheck(2, 0.01)]))
+    rdp = Rdp("10.123/1")
+    start = time.perf_counter()
+    b.check_all(rdp, deadline=0.2)
+    assert time.perf_counter() - start < 0.5
+    results = [c.get_last_result(rdp.pid) for c in b.checks]
+    assert results[0].success
+    assert results[1].msg.startswith("Timeout: _SleepCheck did not finish")
+    assert results[2].msg.startswith("Timeout: no time left")
+    assert b.score(rdp) == pytest.approx(1 / 3)
+
+    b.check_all(rdp, max_workers=3, deadline=0.2)
+    results = [c.get_last_result(rdp.pid) for c in b.checks]
+    assert [r.success for r in results] == [True, False, True]
+
+    asyncio.run(b.acheck_all(rdp, deadline=0.2))
+    results = [c.get_last_result(rdp.pid) for c in b.checks]
+    assert [r.success for r in results] == [True, False, True]
+
+class _DescriptionsBenchmark(Benchmark):
+    """ Scores the number of descriptions
+    """
+    def __init__(self):
+        Benchmark.__init__(self)
+        self.add_evaluation(IsBetweenEvaluation([DescriptionsNumberCheck()], 1, 100))
+
+@mock.patch('requests.get', side_effect=mocked_requests_get)
+def test_run_corpus(mock_get):
+    pids = [rdp.pid for rdp in get_rdps()[:4]] + ["10.5281/zenodo.exception1"]
+    reports = list(run_corpus(pids, _DescriptionsBenchmark, processes=2))
+    assert sorted(r["pid"] for r in reports) == sorted(pids)
+    reports = {r["pid"]: r for r in reports}
+    assert reports[pids[0]]["score"] == 1
+    assert reports[pids[1]]["score"] == 0
+    assert len(reports[pids[0]]["check_reports"]) == 1
+    assert reports["10.5281/zenodo.exception1"]["error"].startswith("CannotCreateRDPException")
+
+@mock.patch('requests.get', side_effect=mocked_requests_get)
+def test_arun_corpus(mock_get):
+    pids = [rdp.pid for rdp in get_rdps()[:4]] + ["10.5281/zenodo.exception1"]
+    async def collect():
+        return [r async for r in arun_corpus(pids, _DescriptionsBenchmark(), concurrency=2)]
+    reports = asyncio.run(collect())
+    assert sorted(r["pid"] for r in reports) == sorted(pids)
+    reports = {r["pid"]: r for r in reports}
+    assert reports[pids[0]]["score"] == 1
+    assert reports[pids[1]]["score"] == 0
+    assert reports["10.5281/zenodo.exception1"]["error"].startswith("CannotCreateRDPException")
+
+def _rescore_benchmark(versions):
+    b = Benchmark()
+    b.version = "0.0.1"
+    checks = [_SleepCheck(0, 0), _SleepCheck(1, 0), _SleepCheck(2, 0)]
+    if versions[2] != "0.0.1":
+        checks[2] = _FailingCheck(2)
+    for c, version in zip(checks, versions):
+        c.version = version
+    b.add_evaluation(TrueEvaluation(checks[:2]))
+    b.add_evaluation(TrueEvaluation(checks[2:]))
+    return b
+
+def test_rescore():
+    rdp = Rdp("10.123/1")
+    b = _rescore_benchmark(["0.0.1"] * 3)
+    b.check_all(rdp)
+    # Reports are stored as JSON
+    report = json.loads(json.dumps(BenchmarkReport(rdp, b).todict()))
+    assert report["score"] == 1
+
+    with mock.patch("breadp.benchmarks.runner.RdpFactory.create") as create:
+        b = _rescore_benchmark(["0.0.1"] * 3)
+        updated = rescore(b, report)
+        create.assert_not_called()
+    assert updated["recomputed"] == {"checks": [], "evaluations": [], "score": False}
+    assert updated["score"] == 1
+    assert updated["check_reports"] == report["check_reports"]
+    assert all(len(c.log) == 0 for c in b.checks)
+    assert b.checks_saved == 3
+
+    # A new version of check 2 only reruns check 2 and its evaluation
+    b = _rescore_benchmark(["0.0.1", "0.0.1", "0.0.2"])
+    updated = rescore(b, report, rdp=rdp)
+    assert updated["recomputed"] == {
+        "checks": [2],
+        "evaluations": [b.evaluations[1].id],
+        "score": True
+    }
+    assert updated["score"] == 0.5
+    assert updated["evaluation_reports"][0] == report["evaluation_reports"][0]
+    assert updated["check_reports"][2]["version"] == "0.0.2"
+    assert [len(c.log) for c in b.checks] == [0, 0, 1]
+    assert (b.checks_run, b.checks_saved) == (1, 2)
+    assert rescore(b, updated)["recomputed"]["checks"] == []
+
+    # A new version of an evaluation reuses the results of its checks
+    b = _rescore_benchmark(["0.0.1"] * 3)
+    b.evaluations[0].version = "0.0.2"
+    updated = rescore(b, report, rdp=rdp)
+    assert updated["recomputed"] == {
+        "checks": [],
+        "evaluations": [b.evaluations[0].id],
+        "score": True
+    }
+    assert updated["score"] == 1
+    assert b.checks[0].get_last_result(rdp.pid).outcome
+    assert b.checks[0].log.get_last_by_pid(rdp.pid).start == report["check_reports"][0]["start"]
+
+def test_rescore_unsuccessful_network_result():
+    rdp = Rdp("10.123/1")
+    def benchmark():
+        b = Benchmark()
+        checks = [_FailingCheck(0), _FailingCheck(1)]
+        checks[0].network = True
+        b.add_evaluation(TrueEvaluation(checks))
+        return b
+    b = benchmark()
+    b.check_all(rdp)
+    report = json.loads(json.dumps(BenchmarkReport(rdp, b).todict()))
+
+    # The network check runs again, the unsuccessful result of the other
+    # check is reused
+    b = benchmark()
+    updated = rescore(b, report, rdp=rdp)
+    assert updated["recomputed"]["checks"] == [0]
+    assert [len(c.log) for c in b.checks] == [1, 1]
+    assert (b.checks_run, b.checks_saved) == (1, 1)
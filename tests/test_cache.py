@@ -0,0 +1,99 @@
+################################################################################
+# Copyright: Tobias Weber 2020
+#
+# Apache 2.0 License
+#
+# This file contains all Cache-related tests
+#
+################################################################################
+
+import multiprocessing
+import pytest
+import time
+
+from breadp.util.cache import Cache
+
+def test_cache_lru():
+    cache = Cache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert "b" not in cache
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.get("b", "missing") == "missing"
+    assert len(cache) == 2
+    assert cache.evictions == 1
+    assert cache.hits == 3
+    assert cache.misses == 1
+    assert cache.stats() == {
+        "size": 2,
+        "hits": 3,
+        "misses": 1,
+        "evictions": 1,
+        "hit_rate": 0.75
+    }
+    assert Cache().stats()["hit_rate"] is None
+    with pytest.raises(ValueError):
+        Cache(maxsize=0)
+
+def test_cache_ttl():
+    cache = Cache(ttl=60, negative_ttl=0.05)
+    cache.put("ok", 200)
+    cache.put("failure", 404, negative=True)
+    assert cache.get("failure") == 404
+    time.sleep(0.1)
+    assert cache.get("failure") is None
+    assert cache.get("ok") == 200
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.hits == 0
+
+def test_cache_persistence(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = Cache(path=path, namespace="licenses")
+    cache.put("https://creativecommons.org/licenses/by/4.0", 200)
+    cache.put("https://example.org/license", "ConnectionError", negative=True)
+    cache.close()
+
+    cache = Cache(path=path, namespace="licenses")
+    assert cache.get("https://creativecommons.org/licenses/by/4.0") == 200
+    assert cache.get("https://example.org/license") == "ConnectionError"
+    assert cache.hits == 2
+    assert Cache(path=path, namespace="dois").get("https://example.org/license") is None
+    cache.clear()
+    cache.close()
+    assert Cache(path=path, namespace="licenses").get("https://example.org/license") is None
+
+def test_cache_database_is_bounded(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = Cache(maxsize=10, ttl=60, negative_ttl=0.05, path=path)
+    cache.put_many((str(i), i, i % 2 == 1, None) for i in range(25))
+    cache.put("other", 0)
+    def rows():
+        return cache._db.execute("SELECT key FROM cache ORDER BY rowid").fetchall()
+    assert len(rows()) <= 2 * cache.maxsize
+    time.sleep(0.1)
+    cache.close()
+
+    # Expired entries are deleted on opening, the entries written last kept
+    cache = Cache(maxsize=10, ttl=60, negative_ttl=0.05, path=path)
+    assert [key for key, in rows()] == ["16", "18", "20", "22", "24", "other"]
+    assert cache.get("24") == 24
+    assert cache.get("0") is None
+    cache.close()
+
+def _put_in_child(cache):
+    cache.put("child", 1)
+
+def test_cache_shared_with_forked_processes(tmp_path):
+    cache = Cache(path=str(tmp_path / "cache.sqlite"))
+    cache.put("parent", 0)
+    context = multiprocessing.get_context("fork")
+    process = context.Process(target=_put_in_child, args=(cache,))
+    process.start()
+    process.join()
+    assert process.exitcode == 0
+    assert cache.get("child") == 1
+    assert cache.get("parent") == 0
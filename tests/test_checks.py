@@ -7,18 +7,25 @@
 #
 ################################################################################
 
+import asyncio
 import math
 import pytest
 import re
 from unittest import mock
 import sys
+import time
 
 from util import \
     base_init_check_test, \
     get_rdps, \
+    local_server, \
     mocked_requests_get, \
     mocked_requests_head
-from breadp.checks import Check
+from breadp import CircuitOpenException
+from breadp.checks import Check, fingerprint, metadata
+from breadp.checks.result import BooleanResult
+from breadp.evaluations import TrueEvaluation
+from breadp.util.cache import Cache
 from breadp.checks.pid import IsValidDoiCheck, DoiResolvesCheck
 from breadp.checks.metadata import \
     CreatorsContainInstitutionsCheck, \
@@ -153,6 +160,137 @@ def test_doi_resolve_check(mock_head, mock_get):
     assert not check.log.get_by_pid(rdp.pid)[-1].result.success
     assert check.get_last_result(rdp.pid).msg == "Exception: Something went terribly wrong"
 
+@mock.patch('requests.head', side_effect=mocked_requests_head)
+@mock.patch('requests.get', side_effect=mocked_requests_get)
+def test_doi_resolve_check_cache(mock_get, mock_head, tmp_path):
+    rdps = [RdpFactory.create(pid, "zenodo") for pid in (
+        "10.5281/zenodo.3490396",
+        "10.123/zenodo.3490396-failure",
+        "10.123/zenodo.3490396-exception"
+    )]
+    path = str(tmp_path / "cache.sqlite")
+    check = DoiResolvesCheck()
+    check.cache = Cache(path=path, namespace="dois", ttl=3600, negative_ttl=60)
+    for rdp in rdps:
+        check.check(rdp)
+    assert mock_head.call_count == 3
+    first = [check.get_last_result(rdp.pid) for rdp in rdps]
+
+    # A re-run only repeats the request which raised an exception
+    check = DoiResolvesCheck()
+    check.cache = Cache(path=path, namespace="dois", ttl=3600, negative_ttl=60)
+    for rdp in rdps:
+        check.check(rdp)
+    assert mock_head.call_count == 4
+    for rdp, expected in zip(rdps, first):
+        result = check.get_last_result(rdp.pid)
+        assert result.outcome == expected.outcome
+        assert result.msg == expected.msg
+        assert result.success == expected.success
+
+    check = DoiResolvesCheck()
+    check.preload([("10.5281/ZENODO.1", 302, "https://zenodo.org/record/1", None),
+                   ("10.5281/zenodo.2", 404, None, time.time() - 48 * 3600)])
+    check.check(Rdp("10.5281/zenodo.1"))
+    assert check.get_last_result("10.5281/zenodo.1").outcome
+    assert mock_head.call_count == 4
+    check.check(Rdp("10.5281/zenodo.2"))
+    assert mock_head.call_count == 5
+
+def test_doi_resolve_check_known_results_without_thread():
+    check = DoiResolvesCheck()
+    check.preload([("10.5281/zenodo.1", 302, "https://zenodo.org/record/1", None)])
+    with mock.patch("breadp.checks.threading.Thread") as thread:
+        check.check(Rdp("10.5281/zenodo.1"))
+        check.check(Rdp(""))
+        asyncio.run(check.acheck(Rdp("10.5281/zenodo.1"), timeout=0))
+        thread.assert_not_called()
+    assert check.get_last_result("10.5281/zenodo.1").outcome
+    assert not check.get_last_result("").success
+
+def test_doi_resolve_check_async():
+    def respond(path):
+        if path.endswith("failure"):
+            return 404, {}
+        return 302, {"Location": "https://zenodo.org/record/3490396"}
+    check = DoiResolvesCheck()
+    with local_server(respond) as url:
+        check.resolver = url + "/"
+        for pid, outcome in (("10.5281/zenodo.3490396", True),
+                             ("10.123/zenodo.3490396-failure", False)):
+            asyncio.run(check.acheck(Rdp(pid)))
+            assert check.get_last_result(pid).success
+            assert check.get_last_result(pid).outcome == outcome
+    asyncio.run(check.acheck(Rdp("")))
+    assert not check.get_last_result("").success
+
+def test_doi_resolve_check_caches_definitive_answers():
+    answers = {"/10.123/busy": [503, 302], "/10.123/gone": [410, 302]}
+    def respond(path):
+        status_code = answers[path].pop(0)
+        return status_code, {"Location": "https://zenodo.org/record/1"}
+    check = DoiResolvesCheck()
+    with local_server(respond) as url:
+        check.resolver = url + "/"
+        for pid in ("10.123/busy", "10.123/gone"):
+            asyncio.run(check.acheck(Rdp(pid)))
+            assert not check.get_last_result(pid).outcome
+        # The transient answer is asked again, the DOI which is gone is not
+        for pid, outcome in (("10.123/busy", True), ("10.123/gone", False)):
+            asyncio.run(check.acheck(Rdp(pid)))
+            assert check.get_last_result(pid).outcome == outcome
+    assert answers == {"/10.123/busy": [], "/10.123/gone": [302]}
+    assert len(check.cache) == 2
+
+class _SleepCheck(Check):
+    def __init__(self):
+        Check.__init__(self)
+        self.id = 0
+        self.version = "0.0.1"
+
+    async def _ado_check(self, rdp):
+        await asyncio.sleep(10)
+
+class _SlowCheck(Check):
+    def __init__(self, delay):
+        Check.__init__(self)
+        self.id = 0
+        self.version = "0.0.1"
+        self.delay = delay
+
+    def _do_check(self, rdp):
+        time.sleep(self.delay)
+        return BooleanResult(True, "", True)
+
+def test_check_timeout():
+    check = _SlowCheck(0.5)
+    check.timeout = 0.05
+    rdp = Rdp("10.123/1")
+    start = time.perf_counter()
+    check.check(rdp)
+    assert time.perf_counter() - start < 0.4
+    result = check.get_last_result(rdp.pid)
+    assert not result.success
+    assert result.msg == "Timeout: _SlowCheck did not finish within 0.05s"
+    assert TrueEvaluation([check]).evaluate(rdp.pid) == 0
+
+    check.check(rdp, timeout=1)
+    assert check.get_last_result(rdp.pid).outcome
+    check.check(rdp, timeout=-1)
+    assert check.get_last_result(rdp.pid).msg.startswith("Timeout: no time left")
+
+    # Exceptions are raised as without timeout
+    with pytest.raises(NotImplementedError):
+        Check().check(Rdp("10.123/1"), timeout=1)
+
+def test_acheck_timeout():
+    check = _SleepCheck()
+    asyncio.run(check.acheck(Rdp("10.123/1"), timeout=0.01))
+    result = check.get_last_result("10.123/1")
+    assert not result.success
+    assert result.outcome is None
+    assert result.msg.startswith("Timeout")
+
 @mock.patch('requests.get', side_effect=mocked_requests_get)
 def test_descriptions_number_check(mock_get):
     check = DescriptionsNumberCheck()
@@ -424,6 +562,33 @@ def test_rights_has_at_least_one_license(mock_get, mock_head):
     assert check.get_last_result(rdp.pid).msg.startswith("No license retrievable:")
 
 
+@mock.patch('requests.head', side_effect=mocked_requests_head)
+@mock.patch('requests.get', side_effect=mocked_requests_get)
+def test_rights_has_at_least_one_license_cache(mock_get, mock_head):
+    check = RightsHasAtLeastOneLicenseCheck()
+    rdp = RdpFactory.create("10.5281/zenodo.3490396", "zenodo")
+    check.check(rdp)
+    calls = mock_head.call_count
+    assert calls > 0
+    assert check.cache.misses == calls
+    check.check(rdp)
+    assert mock_head.call_count == calls
+    assert check.cache.hits == calls
+    assert check.get_last_result(rdp.pid).outcome
+
+@mock.patch('requests.get', side_effect=mocked_requests_get)
+def test_rights_has_at_least_one_license_circuit_open(mock_get):
+    check = RightsHasAtLeastOneLicenseCheck()
+    rdp = RdpFactory.create("10.5281/zenodo.3490396", "zenodo")
+    error = CircuitOpenException("Circuit for creativecommons.org is open")
+    with mock.patch.object(metadata.net, "head", side_effect=error):
+        check.check(rdp)
+    result = check.get_last_result(rdp.pid)
+    assert not result.success
+    assert not result.outcome
+    assert result.msg == "CircuitOpenException: Circuit for creativecommons.org is open"
+    assert len(check.cache) == 0
+
 @mock.patch('requests.get', side_effect=mocked_requests_get)
 def test_rights_are_open_check(mock_get):
     check = RightsAreOpenCheck()
@@ -970,3 +1135,139 @@ def test_capacities_supported_check(mock_get):
 def test_rdp_zenodo_data(mock_get):
     rdps = get_rdps()
     assert len(rdps[0].data) == 1
+
+@mock.patch('requests.get', side_effect=mocked_requests_get)
+def test_check_many(mock_get):
+    rdps = get_rdps()
+    for check_class in (DescriptionsLanguageCheck,
+                        DescriptionsLengthCheck,
+                        FormatsAreValidMediaTypeCheck,
+                        SizesByteSizeCheck,
+                        TitlesJustAFileNameCheck,
+                        TitlesLanguageCheck):
+        single = check_class()
+        batch = check_class()
+        for rdp in rdps:
+            single.check(rdp)
+        batch.check_many(rdps)
+        assert len(batch.log) == len(rdps)
+        for rdp in rdps:
+            expected = single.get_last_result(rdp.pid)
+            result = batch.get_last_result(rdp.pid)
+            assert result.outcome == expected.outcome
+            assert result.msg == expected.msg
+            assert result.success == expected.success
+            assert batch.log.get_last_by_pid(rdp.pid).duration_ns >= 0
+
+def test_language_cache(tmp_path):
+    path = str(tmp_path / "languages.db")
+    texts = [
+        "This is an English sentence about research data.",
+        " This is an  English sentence about research data.",
+        "1234"
+    ]
+    try:
+        metadata.configure_language_cache(path=path)
+        languages = metadata.detect_languages(texts)
+        assert [languages[t] for t in texts] == ["en", "en", None]
+        assert metadata.language_cache.stats()["misses"] == 2
+        assert len(metadata.language_cache) == 2
+
+        # Another process (or run) shares the detected languages
+        metadata.configure_language_cache(path=path)
+        with mock.patch.object(metadata, "_detect_language") as detect:
+            languages = metadata.detect_languages(texts + [texts[0]])
+            detect.assert_not_called()
+        assert [languages[t] for t in texts] == ["en", "en", None]
+        stats = metadata.language_cache.stats()
+        assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (3, 0, 1)
+    finally:
+        metadata.configure_language_cache()
+
+def test_language_cache_errors():
+    from langdetect.lang_detect_exception import ErrorCode, LangDetectException
+    text = "Ein deutscher Satz über Forschungsdaten."
+    try:
+        metadata.configure_language_cache()
+        assert metadata.language_cache.negative_ttl is not None
+        # Errors of langdetect (e.g. missing profiles) are not cached
+        error = LangDetectException(ErrorCode.NeedLoadProfileError, "No profiles")
+        with mock.patch("langdetect.detect", side_effect=error):
+            metadata._langdetect_api = None
+            assert metadata.detect_languages([text]) == {text: None}
+        metadata._langdetect_api = None
+        assert len(metadata.language_cache) == 0
+        assert metadata.detect_languages([text]) == {text: "de"}
+        assert len(metadata.language_cache) == 1
+    finally:
+        metadata._langdetect_api = None
+        metadata.configure_language_cache()
+
+@mock.patch('requests.get', side_effect=mocked_requests_get)
+def test_check_result_cache(mock_get, tmp_path):
+    rdps = get_rdps()
+    path = str(tmp_path / "results.db")
+    check = TitlesJustAFileNameCheck()
+    check.results = Cache(path=path, namespace="results")
+    check.check(rdps[0])
+    expected = check.get_last_result(rdps[0].pid)
+    assert check.results.misses == 1
+    assert len(check.results) == 1
+
+    # Another run (e.g. another process) reuses the stored result
+    other = TitlesJustAFileNameCheck()
+    other.results = Cache(path=path, namespace="results")
+    with mock.patch.object(other, "_do_check") as do_check, \
+         mock.patch.object(other, "_do_check_many") as do_check_many:
+        other.check(rdps[0])
+        other.check_many(rdps[:1])
+        do_check.assert_not_called()
+        do_check_many.assert_not_called()
+    result = other.get_last_result(rdps[0].pid)
+    assert type(result) is type(expected)
+    assert result.outcome == expected.outcome
+    assert result.msg == expected.msg
+    assert other.results.hits == 2
+
+    # Other metadata or a new version of the check are computed again
+    other.check(rdps[1])
+    assert other.results.misses == 1
+    other.version = "99.0.0"
+    other.check(rdps[0])
+    assert other.results.misses == 2
+
+    # Results of checks sending requests are reused only with a ttl
+    license_check = RightsHasAtLeastOneLicenseCheck()
+    license_check.results = Cache()
+    assert license_check._result_key(rdps[0]) is None
+    license_check.result_ttl = 60
+    assert license_check._result_key(rdps[0]) is not None
+
+    # Failures are not cached
+    slow = _SlowCheck(0.5)
+    slow.fields = ("pid",)
+    slow.results = Cache()
+    slow.check(Rdp("10.123/1"), timeout=0.01)
+    assert len(slow.results) == 0
+
+    # Neither are unsuccessful results of checks sending requests
+    doi_check = DoiResolvesCheck()
+    doi_check.results = Cache()
+    doi_check.result_ttl = 60
+    error = ConnectionError("Host unreachable")
+    with mock.patch("breadp.util.net.head", side_effect=error):
+        doi_check.check(Rdp("10.123/1"))
+    assert not doi_check.get_last_result("10.123/1").success
+    assert len(doi_check.results) == 0
+
+def test_fingerprint():
+    class Title(object):
+        def __init__(self, text):
+            self.text = text
+    rdp = Rdp("10.123/1")
+    rdp.titles = [Title("a.txt")]
+    before = fingerprint(rdp, ("titles", "pid"))
+    assert fingerprint(rdp, ("titles", "pid")) == before
+    rdp.titles[0].text = "b.txt"
+    assert fingerprint(rdp, ("titles", "pid")) != before
+    assert fingerprint(rdp, ("missing",)) == fingerprint(rdp, ("missing",))
@@ -0,0 +1,74 @@
+################################################################################
+# Copyright: Tobias Weber 2020
+#
+# Apache 2.0 License
+#
+# This file contains all tests of the offline DOI index
+#
+################################################################################
+
+import gzip
+import pytest
+import subprocess
+import sys
+from unittest import mock
+
+from rdp import Rdp
+
+from breadp.checks.pid import DoiResolvesCheck
+from breadp.util.doiindex import build, DoiIndex, normalize, read_dump
+
+from util import mocked_requests_head
+
+def test_doi_index(tmp_path):
+    path = str(tmp_path / "dois.idx")
+    dois = ["10.5281/zenodo.{}".format(i) for i in range(0, 2000, 2)]
+    assert build(dois + ["https://doi.org/10.5281/ZENODO.0", ""], path) == 1000
+    with DoiIndex(path) as index:
+        assert len(index) == 1000
+        for doi in dois:
+            assert doi in index
+        assert "doi:10.5281/Zenodo.2" in index
+        assert all("10.5281/zenodo.{}".format(i) not in index for i in range(1, 2000, 2))
+    (tmp_path / "empty.idx").write_bytes(b"no index")
+    with pytest.raises(ValueError):
+        DoiIndex(str(tmp_path / "empty.idx"))
+
+def test_doi_index_normalize():
+    assert normalize(" https://doi.org/10.5281/Zenodo.1\n") == "10.5281/zenodo.1"
+    assert normalize("doi:10.5281/zenodo.1") == "10.5281/zenodo.1"
+    assert normalize("10.5281/zenodo.1") == "10.5281/zenodo.1"
+
+def test_doi_index_command(tmp_path):
+    dump = str(tmp_path / "dois.txt.gz")
+    with gzip.open(dump, "wt") as f:
+        f.write("10.5281/zenodo.1\n\n10.5281/zenodo.2\n")
+    assert list(read_dump(dump)) == ["10.5281/zenodo.1", "10.5281/zenodo.2"]
+    path = str(tmp_path / "dois.idx")
+    subprocess.run(
+        [sys.executable, "-m", "breadp.util.doiindex", dump, path],
+        check=True
+    )
+    with DoiIndex(path) as index:
+        assert len(index) == 2
+
+@mock.patch('requests.head', side_effect=mocked_requests_head)
+def test_doi_resolve_check_index(mock_head, tmp_path):
+    path = str(tmp_path / "dois.idx")
+    build(["10.5281/zenodo.1"], path)
+    check = DoiResolvesCheck()
+    check.index = DoiIndex(path)
+    check.check(Rdp("10.5281/zenodo.1"))
+    assert check.get_last_result("10.5281/zenodo.1").outcome
+    assert mock_head.call_count == 0
+
+    # Misses are resolved
+    check.check(Rdp("10.5281/zenodo.3490396"))
+    assert check.get_last_result("10.5281/zenodo.3490396").outcome
+    assert mock_head.call_count == 1
+
+    check.verify = True
+    check.check(Rdp("10.5281/zenodo.1"))
+    assert not check.get_last_result("10.5281/zenodo.1").outcome
+    assert mock_head.call_count == 2
+    check.index.close()
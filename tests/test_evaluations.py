@@ -11,9 +11,11 @@ import hashlib
 import inspect
 from unittest import mock
 import pytest
+from rdp import Rdp
 
 from breadp import ChecksNotRunException
 from breadp.checks.metadata import DescriptionsNumberCheck
+from breadp.checks.pid import IsValidDoiCheck
 from breadp.evaluations import \
     ContainsAllEvaluation, \
     ContainsAtLeastOneEvaluation, \
@@ -60,6 +62,11 @@ def test_is_between_evaluation(mock_get, mock_head):
     with pytest.raises(ChecksNotRunException) as cnre:
         e.evaluate(rdps[0].pid)
         assert " has no result for " in str(cnre)
+    # a failed check fixes the evaluation even if other checks did not run
+    failed = IsValidDoiCheck()
+    failed.check(Rdp(""))
+    e.checks = [DescriptionsNumberCheck(), failed]
+    assert e.evaluate("") == 0
     # one check
     e.checks = [checks["metric"]]
     assert e.evaluate(rdps[0].pid) == 1
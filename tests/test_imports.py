@@ -0,0 +1,35 @@
+################################################################################
+# Copyright: Tobias Weber 2020
+#
+# Apache 2.0 License
+#
+# This file contains tests of the dependencies imported by breadp
+#
+################################################################################
+
+import json
+import subprocess
+import sys
+
+# Imports rdp first, dependencies it imports itself are not counted
+_IMPORTED = """
+import json
+import sys
+import rdp.services.capacities
+import rdp.exceptions
+before = set(sys.modules)
+from breadp.benchmarks.example import BPGBenchmark
+BPGBenchmark()
+print(json.dumps(sorted(set(sys.modules) - before)))
+"""
+
+def test_heavy_dependencies_are_imported_lazily():
+    output = subprocess.run(
+        [sys.executable, "-c", _IMPORTED],
+        stdout=subprocess.PIPE,
+        universal_newlines=True,
+        check=True
+    ).stdout
+    imported = json.loads(output.splitlines()[-1])
+    for module in ("asyncio", "langdetect", "pandas", "requests"):
+        assert module not in imported
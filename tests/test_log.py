@@ -0,0 +1,269 @@
+################################################################################
+# Copyright: Tobias Weber 2020
+#
+# Apache 2.0 License
+#
+# This file contains all Log-related tests
+#
+################################################################################
+
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+import sys
+import time
+import tracemalloc
+
+from breadp.checks.result import \
+    BooleanResult, \
+    CardinalResult, \
+    compact, \
+    dump, \
+    FailureResult, \
+    ListResult, \
+    load, \
+    MetricResult
+from breadp.util.columnar import ColumnarLog
+from breadp.util.sqlite import SqliteLog
+from breadp.util.log import \
+    CheckLogEntry, \
+    KeepLastNPolicy, \
+    KeepLastPerPidPolicy, \
+    Log, \
+    MaxAgePolicy, \
+    MaxBytesPolicy
+
+def test_log_index():
+    log = Log()
+    assert len(log) == 0
+    assert log.get_by_pid("10.123/1") == []
+    assert log.get_last_by_pid("10.123/1") is None
+
+    for i in range(3):
+        for pid in ("10.123/1", "10.123/2"):
+            log.add(CheckLogEntry(i, i + 1, pid, BooleanResult(i == 2, "", True)))
+    assert len(log) == 6
+    assert len(log.get_by_pid("10.123/1")) == 3
+    assert [le.start_ns for le in log.get_by_pid("10.123/2")] == [0, 1, 2]
+    assert log.get_last_by_pid("10.123/1") is log.get_by_pid("10.123/1")[-1]
+    assert log.get_last_by_pid("10.123/2").result.outcome
+    assert log.log[-1] is log.get_last_by_pid("10.123/2")
+
+def test_log_entry_timestamps():
+    le = CheckLogEntry(1583064000123456789, 1583064001123457789, "10.123/1", None)
+    assert le.start == "2020-03-01T12:00:00.123456"
+    assert le.end == "2020-03-01T12:00:01.123457"
+    assert le.duration_ns == 1000001000
+    assert CheckLogEntry(0, 0, "10.123/1", None).start == "1970-01-01T00:00:00"
+
+def _add(log, pid, outcome=True):
+    le = CheckLogEntry(0, 1, pid, BooleanResult(outcome, "", True))
+    log.add(le)
+    return le
+
+def test_keep_last_per_pid_policy():
+    log = Log(KeepLastPerPidPolicy())
+    for i in range(5):
+        _add(log, "10.123/1")
+        last = _add(log, "10.123/2")
+    assert len(log) == 2
+    assert log.get_by_pid("10.123/2") == [last]
+    assert log.get_last_by_pid("10.123/2") is last
+
+def test_keep_last_n_policy():
+    with pytest.raises(ValueError):
+        KeepLastNPolicy(0)
+    log = Log(KeepLastNPolicy(3))
+    entries = [_add(log, "10.123/{}".format(i)) for i in range(10)]
+    assert len(log) == 3
+    assert log.log == entries[-3:]
+    assert log.get_last_by_pid("10.123/0") is None
+    assert log.get_by_pid("10.123/9") == [entries[-1]]
+
+def test_max_age_policy():
+    log = Log(MaxAgePolicy(0.05))
+    _add(log, "10.123/1")
+    _add(log, "10.123/2")
+    time.sleep(0.1)
+    last = _add(log, "10.123/3")
+    assert log.log == [last]
+
+def test_max_bytes_policy():
+    log = Log()
+    _add(log, "10.123/1")
+    entry_size = log.nbytes
+    log.retention = MaxBytesPolicy(entry_size * 4)
+    for i in range(100):
+        _add(log, "10.123/{}".format(i))
+    assert len(log) <= 4
+    assert log.nbytes <= entry_size * 4
+    # the last entry is never evicted
+    log.retention = MaxBytesPolicy(0)
+    last = _add(log, "10.123/last")
+    assert log.log == [last]
+
+def test_policy_bookkeeping():
+    # Times and sizes of entries are only recorded while a policy needs them
+    log = Log()
+    first = _add(log, "10.123/1")
+    assert log.oldest() == (first, None, None)
+    log.retention = [MaxAgePolicy(60), MaxBytesPolicy(10 ** 6)]
+    _add(log, "10.123/1")
+    le, added, size = log.oldest()
+    assert le is first
+    assert added <= time.monotonic()
+    assert 2 * size == log.nbytes
+    log.retention = KeepLastPerPidPolicy()
+    _add(log, "10.123/1")
+    assert log.oldest()[1:] == (None, None)
+    assert len(log) == 1
+
+def test_pinned_pid_survives_eviction():
+    log = Log(KeepLastNPolicy(1))
+    log.pin("10.123/1")
+    pinned = _add(log, "10.123/1")
+    for i in range(10):
+        _add(log, "10.123/other{}".format(i))
+    assert len(log) == 1
+    assert log.get_last_by_pid("10.123/1") is pinned
+    assert log.get_by_pid("10.123/1") == [pinned]
+    log.unpin("10.123/1")
+    assert log.get_last_by_pid("10.123/1") is None
+
+def test_columnar_log():
+    log = ColumnarLog()
+    assert len(log) == 0
+    assert log.get_by_pid("10.123/1") == []
+    assert log.get_last_by_pid("10.123/1") is None
+    with pytest.raises(ValueError):
+        log.retention = KeepLastNPolicy(1)
+
+    start = 1583064000123456789
+    end = start + 10 ** 9
+    results = [
+        BooleanResult(True, "", True),
+        BooleanResult(False, "not valid", False),
+        MetricResult(2, "", True),
+        MetricResult(sys.float_info.min, "No IssueDate retrievable", False),
+        MetricResult(2 ** 70, "Used metadata", True),
+        CardinalResult("en", "", True),
+        ListResult([69, 3], "", True),
+        ListResult([], "No descriptions retrievable", True),
+        ListResult([True, None, "Abstract"], "", True),
+    ]
+    for i, r in enumerate(results):
+        log.add(CheckLogEntry(start, end, "10.123/{}".format(i % 2), r))
+    assert len(log) == len(results)
+    entries = log.get_by_pid("10.123/0") + log.get_by_pid("10.123/1")
+    assert len(entries) == len(results)
+    for le, r in zip(log.log, results):
+        assert le.start_ns == start
+        assert le.end_ns == end
+        assert type(le.result) is type(r)
+        assert le.result.outcome == r.outcome
+        assert le.result.msg == r.msg
+        assert le.result.success == r.success
+    assert log.get_last_by_pid("10.123/0").result.outcome == [True, None, "Abstract"]
+    assert log.get_last_by_pid("10.123/1").result.outcome == []
+
+def test_sqlite_log(tmp_path):
+    path = str(tmp_path / "log.sqlite")
+    start = 1583064000123456789
+    end = start + 10 ** 9
+    results = [
+        BooleanResult(True, "", True),
+        MetricResult(sys.float_info.min, "No IssueDate retrievable", False),
+        ListResult([True, None, "Abstract"], "", True),
+    ]
+    with SqliteLog(path, 1, "0.0.1", batch_size=2) as log:
+        assert len(log) == 0
+        assert log.get_last_by_pid("10.123/1") is None
+        for r in results:
+            log.add(CheckLogEntry(start, end, "10.123/1", r))
+        # the last entry is still pending
+        assert len(log) == 3
+        assert len(log.get_by_pid("10.123/1")) == 3
+        assert log.get_last_by_pid("10.123/1").result.outcome == [True, None, "Abstract"]
+        log.add(CheckLogEntry(start, end, "10.123/2", CardinalResult("en", "", True)))
+        with pytest.raises(ValueError):
+            log.add(CheckLogEntry(start, end, "10.123/2", object()))
+
+    # entries survive the process and are scoped by check id and version
+    with SqliteLog(path, 1, "0.0.1") as log:
+        assert len(log) == 4
+        for le, r in zip(log.get_by_pid("10.123/1"), results):
+            assert le.start_ns == start
+            assert le.end_ns == end
+            assert type(le.result) is type(r)
+            assert le.result.outcome == r.outcome
+            assert le.result.msg == r.msg
+            assert le.result.success == r.success
+        assert log.get_last_by_pid("10.123/2").result.outcome == "en"
+    with SqliteLog(path, 1, "0.0.2") as log:
+        assert len(log) == 0
+        assert log.get_last_by_pid("10.123/1") is None
+
+class _DictCheckLogEntry(object):
+    def __init__(self, start, end, pid, result):
+        self.start = start
+        self.end = end
+        self.pid = pid
+        self.result = result
+
+class _DictListResult(object):
+    def __init__(self, outcome, msg, success):
+        self.msg = msg
+        self.success = success
+        self.outcome = outcome
+
+def _bytes_per_entry(entry_class, result_class, shared):
+    n = 10000
+    pid = "10.123/1"
+    tracemalloc.start()
+    entries = []
+    for i in range(n):
+        result = result_class([], "", True)
+        if shared:
+            result = compact(result)
+        entries.append(entry_class(0, 1, pid, result))
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size / n
+
+def test_compact_entries():
+    assert compact(BooleanResult(True, "", True)) is compact(BooleanResult(True, "", True))
+    assert compact(ListResult([], "", False)) is compact(ListResult([], "", False))
+    assert not compact(ListResult([], "", False)).success
+    r = ListResult([1], "", True)
+    assert compact(r) is r
+    r = BooleanResult(True, "Location of resolved doi", True)
+    assert compact(r) is r
+    with pytest.raises(AttributeError):
+        r.details = "no __dict__"
+
+    before = _bytes_per_entry(_DictCheckLogEntry, _DictListResult, False)
+    after = _bytes_per_entry(CheckLogEntry, ListResult, True)
+    assert after < before / 2
+
+def test_dump_and_load_results():
+    for r in (BooleanResult(True, "", True),
+              ListResult(["a", None], "msg", False),
+              MetricResult(1.5, "", True),
+              FailureResult("Timeout")):
+        loaded = load(dump(r))
+        assert type(loaded) is type(r)
+        assert loaded.outcome == r.outcome
+        assert loaded.msg == r.msg
+        assert loaded.success == r.success
+    with pytest.raises(ValueError):
+        load(["Log", None, "", True])
+
+def test_concurrent_adds():
+    for log in (Log(KeepLastPerPidPolicy()), ColumnarLog()):
+        def add(i):
+            for j in range(200):
+                _add(log, "10.123/{}".format(j % 20), j % 2 == 0)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(add, range(8)))
+        expected = 20 if isinstance(log, Log) else 8 * 200
+        assert len(log) == expected
+        assert sum(len(log.get_by_pid("10.123/{}".format(j))) for j in range(20)) == expected
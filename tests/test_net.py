@@ -0,0 +1,203 @@
+################################################################################
+# Copyright: Tobias Weber 2020
+#
+# Apache 2.0 License
+#
+# This file contains all tests of the HTTP client layer
+#
+################################################################################
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import itertools
+import pytest
+import threading
+import time
+from urllib.parse import urlsplit
+
+from rdp import Rdp
+
+from breadp import CircuitOpenException
+from breadp.checks.pid import DoiResolvesCheck
+from breadp.util import net
+from breadp.util.net import CircuitBreaker, HttpClient
+
+from util import local_server
+
+def test_http_client_keeps_connections_alive():
+    connections = set()
+    client = HttpClient()
+    with local_server(lambda path: (200, {}), connections) as url:
+        for i in range(10):
+            assert client.head(url + "/{}".format(i)).status_code == 200
+        client.close()
+    assert len(connections) == 1
+
+def test_http_client_pool_size():
+    connections = set()
+    client = HttpClient(pool_maxsize=4, rate=None)
+    with local_server(lambda path: (200, {}), connections) as url:
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            responses = list(executor.map(client.head, [url] * 100))
+        client.close()
+    assert all(r.status_code == 200 for r in responses)
+    assert len(connections) <= 4
+
+def test_http_client_headers():
+    client = HttpClient()
+    assert client.session().headers["User-Agent"] == "breadp"
+    assert client.session() is client.session()
+    client.close()
+    client = HttpClient(headers={"User-Agent": "test"})
+    assert client.session().headers["User-Agent"] == "test"
+    client.close()
+
+def test_http_client_async_keeps_connections_alive():
+    connections = set()
+    closed = set()
+    requests = []
+    client = HttpClient(headers={"User-Agent": "test"}, rate=None)
+    async def head_all(url):
+        for i in range(10):
+            assert (await client.ahead(url + "/{}".format(i))).status_code == 200
+        # Requests sent concurrently need connections of their own
+        responses = await asyncio.gather(*(client.ahead(url) for i in range(3)))
+        assert [r.status_code for r in responses] == [200] * 3
+    with local_server(lambda path: (200, {}), connections, requests) as url:
+        asyncio.run(head_all(url))
+        client.close()
+        # Connections closed by the server are replaced
+        with local_server(lambda path: (200, {"Connection": "close"}), closed) as url:
+            asyncio.run(head_all(url))
+    assert len(connections) == 3
+    assert len(closed) == 13
+    assert all(r["User-Agent"] == "test" for r in requests)
+    assert client._session is None
+
+def test_http_client_ssl_context():
+    client = HttpClient()
+    context = client._ssl_context()
+    assert client._ssl_context() is context
+    assert HttpClient()._ssl_context() is not context
+
+def test_http_client_backs_off_when_throttled():
+    lock = threading.Lock()
+    counter = itertools.count()
+    def respond(path):
+        with lock:
+            i = next(counter)
+        return (429, {}) if i < 5 else (200, {})
+    client = HttpClient(rate=100.0, burst=5)
+    with local_server(respond) as url:
+        statuses = [client.head(url).status_code for i in range(5)]
+        host = urlsplit(url).netloc
+        stats = client.stats()[host]
+        assert statuses == [429] * 5
+        assert stats["throttled"] == 5
+        assert stats["rate"] < 5
+        assert stats["concurrency"] == 1
+        for i in range(5):
+            assert client.head(url).status_code == 200
+        client.close()
+    stats = client.stats()[host]
+    assert stats["requests"] == 10
+    assert stats["rate"] > 5
+    assert stats["concurrency"] > 1
+    assert stats["waited"] > 0
+
+def test_http_client_concurrency_limit():
+    lock = threading.Lock()
+    active = [0, 0]
+    def respond(path):
+        with lock:
+            active[0] += 1
+            active[1] = max(active)
+        time.sleep(0.02)
+        with lock:
+            active[0] -= 1
+        return 200, {}
+    client = HttpClient(rate=None, concurrency=2)
+    with local_server(respond) as url:
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(client.head, [url] * 40))
+        async def ahead_all():
+            await asyncio.gather(*(client.ahead(url) for i in range(20)))
+        asyncio.run(ahead_all())
+        client.close()
+    assert active[1] == 2
+    assert client.stats()[urlsplit(url).netloc]["requests"] == 60
+
+def test_circuit_breaker():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.1)
+    assert breaker.allow()
+    breaker.record(False)
+    breaker.record(True)
+    breaker.record(False)
+    assert breaker.state == "closed"
+    breaker.record(False)
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+    # Half-open: one trial request, failure opens again
+    time.sleep(0.1)
+    assert breaker.allow()
+    assert breaker.state == "half-open"
+    assert not breaker.allow()
+    breaker.record(False)
+    assert breaker.state == "open"
+
+    # An unknown outcome allows another trial, success closes
+    time.sleep(0.1)
+    assert breaker.allow()
+    breaker.record(None)
+    assert breaker.allow()
+    breaker.record(True)
+    assert breaker.state == "closed"
+    assert breaker.stats() == {"state": "closed", "failures": 0, "opened": 2, "rejected": 2}
+
+def test_http_client_cancelled_trial():
+    client = HttpClient(rate=None, concurrency=1, failure_threshold=1, reset_timeout=0.05)
+    with local_server(lambda path: (503, {})) as url:
+        host = urlsplit(url).netloc
+        client.head(url)
+        assert client.breaker(host).state == "open"
+        time.sleep(0.05)
+        # The trial request waits for the limiter and is cancelled
+        client.limiter(host).acquire()
+        async def cancelled():
+            task = asyncio.ensure_future(client.ahead(url))
+            await asyncio.sleep(0.1)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+        asyncio.run(cancelled())
+        client.limiter(host).release(None)
+        assert client.breaker(host).state == "half-open"
+        # Another trial request is allowed
+        assert client.head(url).status_code == 503
+        client.close()
+    assert client.breaker(host).state == "open"
+    assert client.breaker(host).stats()["rejected"] == 0
+
+def test_http_client_fails_fast(monkeypatch):
+    client = HttpClient(rate=None, failure_threshold=3, reset_timeout=60)
+    monkeypatch.setattr(net, "head", client.head)
+    check = DoiResolvesCheck()
+    with local_server(lambda path: (503, {})) as url:
+        check.resolver = url + "/"
+        for i in range(5):
+            check.check(Rdp("10.123/{}".format(i)))
+        with pytest.raises(CircuitOpenException):
+            asyncio.run(client.ahead(url))
+        client.close()
+    results = [check.get_last_result("10.123/{}".format(i)) for i in range(5)]
+    for result in results[:3]:
+        assert result.success
+        assert result.msg.endswith("status code: 503")
+    for result in results[3:]:
+        assert not result.success
+        assert result.msg.startswith("CircuitOpenException: Circuit for 127.0.0.1")
+    circuit = client.stats()[urlsplit(url).netloc]["circuit"]
+    assert circuit["state"] == "open"
+    assert circuit["rejected"] == 3
+    assert client.stats()[urlsplit(url).netloc]["requests"] == 3
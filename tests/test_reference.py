@@ -0,0 +1,80 @@
+################################################################################
+# Copyright: Tobias Weber 2020
+#
+# Apache 2.0 License
+#
+# This file contains all tests of the reference data registry
+#
+################################################################################
+
+from concurrent.futures import ThreadPoolExecutor
+import os
+import pytest
+
+from breadp.util import reference
+
+def test_builtin_tables():
+    assert "application/json" in reference.media_types()
+    assert "" not in reference.media_types()
+    assert "CC-BY-4.0" in reference.spdx_identifiers()
+    assert "CC BY 4.0" not in reference.spdx_identifiers()
+    assert "en" in reference.iso_639_1_codes()
+    assert "eng" not in reference.iso_639_1_codes()
+    assert None not in reference.iso_639_1_codes()
+    # frozenset or StringTable (if the tables are compiled, see build)
+    assert reference.media_types() is reference.media_types()
+    assert len(reference.spdx_identifiers()) == len(set(reference.spdx_identifiers()))
+
+def test_tables_are_loaded_once():
+    calls = []
+    def load():
+        calls.append(1)
+        return frozenset(["a"])
+    reference.register("test-table", load)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        tables = list(executor.map(lambda i: reference.get("test-table"), range(100)))
+    assert len(calls) == 1
+    assert all(t is tables[0] for t in tables)
+    reference.clear()
+    assert reference.get("test-table") == frozenset(["a"])
+    assert len(calls) == 2
+    with pytest.raises(KeyError):
+        reference.get("no-such-table")
+
+def test_compiled_tables(tmp_path, monkeypatch):
+    source = tmp_path / "words.txt"
+    source.write_text("b\na\nc\n")
+    def load():
+        with open(str(source)) as f:
+            return frozenset(f.read().split())
+    monkeypatch.setitem(reference._loaders, "test-words", load)
+    monkeypatch.setitem(reference._sources, "test-words", (str(source),))
+    path = str(tmp_path / "tables.bin")
+    assert "test-words" in reference.build(path)
+
+    tables = reference.load_compiled(path)
+    assert set(tables["test-words"]) == {"a", "b", "c"}
+    assert "a" in tables["test-words"]
+    assert "d" not in tables["test-words"]
+    assert None not in tables["test-words"]
+    assert set(tables["iso-639-1"]) == reference._load_iso_639_1_codes()
+    for code in reference._load_media_types():
+        assert code in tables["iana-media-types"]
+
+    # The registry uses the compiled tables
+    monkeypatch.setattr(reference, "COMPILED", path)
+    reference.clear()
+    assert isinstance(reference.get("spdx-license-ids"), reference.StringTable)
+    assert "CC-BY-4.0" in reference.spdx_identifiers()
+    reference.clear()
+
+    # A touched source with the same content is still valid
+    stat = source.stat()
+    os.utime(str(source), ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert reference.load_compiled(path) is not None
+    # A changed source is not
+    source.write_text("b\na\nd\n")
+    assert reference.load_compiled(path) is None
+    assert reference.load_compiled(str(tmp_path / "missing.bin")) is None
+    (tmp_path / "garbage.bin").write_bytes(b"garbage")
+    assert reference.load_compiled(str(tmp_path / "garbage.bin")) is None
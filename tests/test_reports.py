@@ -22,7 +22,9 @@ from util import \
 from breadp.benchmarks.example import BPGBenchmark
 from breadp.checks.metadata import DescriptionsLengthCheck
 from breadp.evaluations import Evaluation, IsBetweenEvaluation
-from breadp.reports import BenchmarkReport, CheckReport, EvaluationReport
+from breadp.reports import BenchmarkReport, CheckReport, EvaluationReport, \
+    LatencyReport, \
+    percentile
 
 @mock.patch('requests.get', side_effect=mocked_requests_get)
 def test_check_report(mock_get):
@@ -92,3 +94,25 @@ def test_benchmark_reporting(mock_get, mock_head):
     assert report.aggregation_info == bb.aggregation_info()
     assert report.precision == sys.float_info.mant_dig
     assert len(report.check_reports) == 34
+
+@mock.patch('requests.get', side_effect=mocked_requests_get)
+def test_latency_report(mock_get):
+    check = DescriptionsLengthCheck()
+    report = LatencyReport(check).todict()
+    assert report["count"] == 0
+    assert report["p50_ns"] is None
+    rdps = get_rdps()
+    for rdp in rdps:
+        check.check(rdp)
+    check.check(rdps[0], timeout=-1)
+    report = LatencyReport(check).todict()
+    assert report["count"] == len(rdps) + 1
+    assert report["timeouts"] == 1
+    assert 0 <= report["p50_ns"] <= report["p99_ns"] <= report["max_ns"]
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile(values, 100) == 100
+    assert percentile([7], 99) == 7
@@ -7,9 +7,12 @@
 #
 ################################################################################
 
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 import inspect
 import json
 import re
+import threading
 
 from breadp.checks.pid import IsValidDoiCheck
 from breadp.checks.metadata import \
@@ -111,6 +114,42 @@ def mocked_requests_head(*args, **kwargs):
         )
     return _MockResponse(None, 404)
 
+@contextmanager
+def local_server(respond, connections=None, requests=None):
+    """ Runs a local HTTP/1.1 server answering HEAD and GET requests with
+        respond(path) -> (status code, headers), yields the base URL. The
+        client address of each request is added to the set connections,
+        the headers of each request are appended to the list requests.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_HEAD(self):
+            if connections is not None:
+                connections.add(self.client_address)
+            if requests is not None:
+                requests.append(dict(self.headers))
+            status, headers = respond(self.path)
+            self.send_response(status)
+            for key, value in headers.items():
+                self.send_header(key, value)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        do_GET = do_HEAD
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield "http://127.0.0.1:{}".format(server.server_address[1])
+    finally:
+        server.shutdown()
+        server.server_close()
+
 # Basic tests for all checks which did not already run
 def base_init_check_test(check, check_id):
     if not check.id == check_id: